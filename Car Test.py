@@ -1,6 +1,13 @@
 from machine import SoftI2C, Pin, PWM
 import time
 from veml6040 import VEML6040
+from telemetry import Telemetry
+from threshold import AdaptiveThreshold
+from recorder import Recorder
+from reacquire import Reacquirer, LEFT
+from trackmap import Odometer, TrackMap
+import stagetime
+from stagetime import stage
 
 # ---- Encoder + Motor classes ----
 class Count:
@@ -64,12 +71,22 @@ print("VEML6040 ready")
 IT_40MS = (0b000 << 4)
 color.set_integration_time(IT_40MS)
 
+RECORD = False   # True records every reading + encoders to run.tlm for replay.py
+if RECORD:
+    color = Recorder(color, (left_motor.enc, right_motor.enc))
+
 # ---- Parameters ----
 BASE    = 60        # forward speed %
 TURN    = 35        # sweep speed %
 HALF_TURN = TURN / 2
 SWEEP_STEP = 0.03   # shorter sleep → faster reading
-SWEEP_TIME = 3.0    # longer sweep → wider range
+SWEEP_TIME = 3.0    # time cap per search arc (encoders stalled / not counting)
+FIRST_ARC = 300     # first search arc, encoder counts of heading (tune!)
+MAX_ARC = 2400      # widest search arc either side of the loss heading
+LAP_MARKER = "green"  # colour patch at the start/finish line
+MIN_LAP = 2000      # encoder counts; ignore the marker again until this far into a lap
+V_MIN = 45          # planned speed % in the sharpest curves (laps 2+)
+V_MAX = 90          # planned speed % on straights (laps 2+)
 
 COLOR_THRESHOLDS = {
     "white": (295, 335, 260, 292, 113, 122, 511, 567),
@@ -78,6 +95,10 @@ COLOR_THRESHOLDS = {
     "green": (181, 184, 170, 171, 62, 63, 340, 341),
     "blue":  (141, 143, 126, 127, 67, 69, 282, 282),
 }
+LABELS = ("unknown", "white", "black", "red", "green", "blue")  # telemetry label codes
+
+# ---- Telemetry (replaces the per-iteration RGBW print) ----
+tlm = Telemetry("<IHHHHB", ("t_ms", "r", "g", "b", "w", "label"), capacity=64, decimate=1)
 
 # ---- Helper functions ----
 def get_rgbw():
@@ -98,6 +119,11 @@ def detect_color(r, g, b, w, black_thresh, white_thresh):
             return label
     return "unknown"
 
+def thresholds(black_w, white_ref):
+    black_thresh = black_w + (white_ref - black_w) * 0.25
+    white_thresh = white_ref - (white_ref - black_w) * 0.25
+    return black_thresh, white_thresh
+
 def calibrate_black_only():
     print("Calibrating... Place sensor on black line.")
     time.sleep(2)
@@ -105,89 +131,153 @@ def calibrate_black_only():
     print("Black reference:", black_w)
     white_sample_min = COLOR_THRESHOLDS["white"][6]
     white_sample_max = COLOR_THRESHOLDS["white"][7]
-    white_ref = (white_sample_min + white_sample_max) / 2
-    black_thresh = black_w + (white_ref - black_w) * 0.25
-    white_thresh = white_ref - (white_ref - black_w) * 0.25
-    print("Calibrated black threshold:", black_thresh)
-    return black_thresh, white_thresh
+    white_ref = (white_sample_min + white_sample_max) // 2
+    print("Calibrated black threshold:", thresholds(black_w, white_ref)[0])
+    return black_w, white_ref
 
 # ---- Sweep logic ----
-def directional_sweep(black_thresh):
-    best_w = 9999
-    best_pos = left_motor.enc.value()
+reacq = Reacquirer(first_arc=FIRST_ARC, max_arc=MAX_ARC)
+
+def heading():
+    return right_motor.enc.value() - left_motor.enc.value()
 
-    # Sweep left
-    t_start = time.ticks_ms()
-    while time.ticks_diff(time.ticks_ms(), t_start) < SWEEP_TIME * 1000:
+def rotate(direction):
+    if direction == LEFT:
         left_motor.start(direction=1, speed=TURN)
         right_motor.start(direction=-1, speed=TURN)
-        _, _, _, w = get_rgbw()
-        if abs(w - black_thresh) < abs(best_w - black_thresh):
-            best_w = w
-            best_pos = left_motor.enc.value()
-        if w < black_thresh:
-            left_motor.stop()
-            right_motor.stop()
-            return
-        time.sleep(SWEEP_STEP)
-
-    left_motor.stop()
-    right_motor.stop()
-    time.sleep(0.05)
-
-    # Sweep right double distance
-    t_start = time.ticks_ms()
-    while time.ticks_diff(time.ticks_ms(), t_start) < SWEEP_TIME * 2 * 1000:
+    else:
         left_motor.start(direction=-1, speed=TURN)
         right_motor.start(direction=1, speed=TURN)
-        _, _, _, w = get_rgbw()
-        if abs(w - black_thresh) < abs(best_w - black_thresh):
-            best_w = w
-            best_pos = left_motor.enc.value()
-        if w < black_thresh:
-            left_motor.stop()
-            right_motor.stop()
-            return
-        time.sleep(SWEEP_STEP)
 
-    left_motor.stop()
-    right_motor.stop()
+def directional_sweep(black_thresh):
+    """
+    Search the likely side first, then alternate in widening arcs bounded by
+    encoder counts from the heading where the line was lost.
+    Returns True once the line is found again.
+    """
+    reacq.lost(heading(), time.ticks_ms())
+    offset = 0          # rotation since loss, + = right, in encoder counts
+    attempt = 0
+    for direction, target in reacq.arcs():
+        attempt += 1
+        rotate(direction)
+        last = heading()
+        t_start = time.ticks_ms()
+        while (target - offset) * direction > 0:
+            _, _, _, w = get_rgbw()
+            if w < black_thresh:
+                left_motor.stop()
+                right_motor.stop()
+                ms = reacq.found(direction, heading(), time.ticks_ms(), attempt)
+                print("Reacquired", "left" if direction == LEFT else "right", "in", ms, "ms")
+                return True
+            h = heading()
+            reacq.learn_turn(direction, h - last)
+            offset += direction * abs(h - last)
+            last = h
+            if time.ticks_diff(time.ticks_ms(), t_start) > SWEEP_TIME * 1000:
+                break
+            time.sleep(SWEEP_STEP)
+        left_motor.stop()
+        right_motor.stop()
+
+    reacq.failed(heading())
+    reacq.report()
     time.sleep(0.05)
+    return False
+
+# ---- Lap learning ----
+# Lap 1 (between the first two LAP_MARKER sightings) drives at BASE and maps
+# curvature and line losses against distance; later laps follow the
+# speed plan from that map.
+odo = Odometer(left_motor.enc, right_motor.enc)
+tmap = TrackMap(v_min=V_MIN, v_max=V_MAX)
+lap = 0             # 0 = before the start line, 1 = learning, 2+ = planned
+lap_t0 = 0
+
+def cruise():
+    speed = tmap.speed_at(odo.dist, BASE) if lap >= 2 else BASE
+    left_motor.start(direction=-1, speed=speed)
+    right_motor.start(direction=-1, speed=speed)
+
+def lap_marker():
+    global lap, lap_t0
+    if lap and odo.dist - tmap.lap_dist < MIN_LAP:
+        return
+    now = time.ticks_ms()
+    if lap:
+        print("Lap", lap, "time:", time.ticks_diff(now, lap_t0) / 1000, "s")
+    if lap == 1:
+        tmap.finish_lap(odo.dist)
+        print("Track learned:", tmap.n, "bins")
+    lap += 1
+    lap_t0 = now
+    tmap.start_lap(odo.dist, odo.heading)
 
 # ---- Main loop ----
-black_thresh, white_thresh = calibrate_black_only()
+# The boot calibration only seeds the levels; black/white readings seen
+# while driving keep them tracking the ambient light.
+levels = AdaptiveThreshold(*calibrate_black_only())
+black_thresh, white_thresh = thresholds(levels.black, levels.white)
 
-while True:
-    r, g, b, w = get_rgbw()
-    detected = detect_color(r, g, b, w, black_thresh, white_thresh)
-    print("Detected:", detected, "RGBW:", (r, g, b, w))
+# Send "p" over serial for per-stage timings, "r" to print and reset them.
+# Reacquisition statistics are printed when the program stops.
+try:
+    while True:
+        with stage("i2c"):
+            r, g, b, w = get_rgbw()
+        with stage("odometry"):
+            odo.update()
+            if lap == 1:
+                tmap.record(odo.dist, odo.heading)
+        with stage("classify"):
+            detected = detect_color(r, g, b, w, black_thresh, white_thresh)
+            if detected == "black" or detected == "white":
+                levels.learn(w, detected == "black")
+                black_thresh, white_thresh = thresholds(levels.black, levels.white)
+        with stage("telemetry"):
+            tlm.log(time.ticks_ms(), r, g, b, w, LABELS.index(detected))
+            tlm.flush(max_records=2)
+        if RECORD:
+            color.flush()
+        stagetime.poll_serial()
 
-    if detected == "black":
-        left_motor.start(direction=-1, speed=BASE)
-        right_motor.start(direction=-1, speed=BASE)
+        if detected == "black":
+            with stage("pwm"):
+                cruise()
 
-    elif detected in ["white", "unknown"]:
-        print("Lost line, performing directional sweep...")
-        directional_sweep(black_thresh)
-        left_motor.start(direction=-1, speed=BASE)
-        right_motor.start(direction=-1, speed=BASE)
+        elif detected in ["white", "unknown"]:
+            print("Lost line, performing directional sweep...")
+            if lap == 1:
+                tmap.record(odo.dist, odo.heading, lost=True)
+            with stage("sweep"):
+                directional_sweep(black_thresh)
+            cruise()
 
-    elif detected in ["red", "green", "blue"]:
-        left_motor.stop()
-        right_motor.stop()
-        time.sleep(0.5)
-        if detected == "green":
-            move_servo(30, hold_time=1)
-        elif detected == "red":
-            move_servo(90, hold_time=1)
-        elif detected == "blue":
-            move_servo(120, hold_time=1)
-        left_motor.start(direction=-1, speed=BASE)
-        right_motor.start(direction=-1, speed=BASE)
-        time.sleep(0.5)
+        elif detected in ["red", "green", "blue"]:
+            if detected == LAP_MARKER:
+                lap_marker()
+            left_motor.stop()
+            right_motor.stop()
+            time.sleep(0.5)
+            if detected == "green":
+                move_servo(30, hold_time=1)
+            elif detected == "red":
+                move_servo(90, hold_time=1)
+            elif detected == "blue":
+                move_servo(120, hold_time=1)
+            cruise()
+            time.sleep(0.5)
 
-    else:
-        left_motor.stop()
-        right_motor.stop()
+        else:
+            left_motor.stop()
+            right_motor.stop()
 
-    time.sleep(0.05)
+        with stage("sleep"):
+            time.sleep(0.05)
+finally:
+    left_motor.stop()
+    right_motor.stop()
+    reacq.report()
+    if RECORD:
+        color.close()
@@ -19,6 +19,7 @@ H3LIS331DL_REG_OUT_Y_L = 0x2A  # Y-Axis LSB
 H3LIS331DL_REG_OUT_Y_H = 0x2B  # Y-Axis MSB
 H3LIS331DL_REG_OUT_Z_L = 0x2C  # Z-Axis LSB
 H3LIS331DL_REG_OUT_Z_H = 0x2D  # Z-Axis MSB
+H3LIS331DL_AUTO_INCREMENT = 0x80  # Set in the register address for multi-byte reads
 
 # Accl Datarate configuration
 H3LIS331DL_ACCL_PM_PD = 0x00    # Power down Mode
@@ -51,6 +52,10 @@ H3LIS331DL_RAW_DATA_MAX = 65536
 
 H3LIS331DL_DEFAULT_RANGE = H3LIS331DL_ACCL_RANGE_100G
 H3LIS331DL_SCALE_FS = H3LIS331DL_RAW_DATA_MAX / 4 / ((H3LIS331DL_DEFAULT_RANGE >> 4) + 1)
+# Datasheet sensitivity at +/-100g: 49 mg per 12-bit digit, left-justified
+# in the 16-bit output, i.e. about 326 raw counts per g. (read_accl_g keeps
+# dividing by SCALE_FS, which the trained gesture/KNN models depend on.)
+H3LIS331DL_LSB_PER_G_100G = 16 / 0.049
 
 class H3LIS331DL:
     def __init__(self, sda_pin=21, scl_pin=22, address=H3LIS331DL_DEFAULT_ADDRESS, freq=400000):
@@ -65,6 +70,8 @@ class H3LIS331DL:
         """
         self._addr = address
         self._i2c = SoftI2C(sda=Pin(sda_pin), scl=Pin(scl_pin), freq=freq)
+        self._raw = bytearray(6)    # burst read buffer
+        self.datarate = H3LIS331DL_ACCL_DR_50
         
         # Check if device is present
         devices = self._i2c.scan()
@@ -85,15 +92,19 @@ class H3LIS331DL:
         """Read a byte from a register"""
         return self._i2c.readfrom_mem(self._addr, register, 1)[0]
     
-    def select_datarate(self):
-        """Select the data rate of the accelerometer from the given provided values"""
-        DATARATE_CONFIG = (H3LIS331DL_ACCL_PM_NRMl | H3LIS331DL_ACCL_DR_50 | 
+    def select_datarate(self, datarate=H3LIS331DL_ACCL_DR_50):
+        """Select the data rate of the accelerometer (H3LIS331DL_ACCL_DR_50 ... _DR_1000)"""
+        DATARATE_CONFIG = (H3LIS331DL_ACCL_PM_NRMl | datarate | 
                           H3LIS331DL_ACCL_XAXIS | H3LIS331DL_ACCL_YAXIS | H3LIS331DL_ACCL_ZAXIS)
         self._write_byte(H3LIS331DL_REG_CTRL1, DATARATE_CONFIG)
+        self.datarate = datarate
     
-    def select_data_config(self):
-        """Select the data configuration of the accelerometer from the given provided values"""
-        DATA_CONFIG = (H3LIS331DL_DEFAULT_RANGE | H3LIS331DL_ACCL_BDU_CONT)
+    def select_data_config(self, bdu=H3LIS331DL_ACCL_BDU_CONT):
+        """
+        Select the data configuration of the accelerometer from the given provided values.
+        bdu=H3LIS331DL_ACCL_BDU_NOT_CONT keeps the LSB and MSB of a burst read from the same sample.
+        """
+        DATA_CONFIG = (H3LIS331DL_DEFAULT_RANGE | bdu)
         self._write_byte(H3LIS331DL_REG_CTRL4, DATA_CONFIG)
     
     def read_who_am_i(self):
@@ -125,6 +136,21 @@ class H3LIS331DL:
         
         return {'x': xAccl, 'y': yAccl, 'z': zAccl}
     
+    def read_accl_into(self, buf, offset=0):
+        """
+        Read raw x, y, z into buf[offset:offset + 3] (e.g. an array('h')).
+        One 6-byte auto-increment I2C transfer instead of six single-byte
+        reads, and no allocation, so it can keep up with the 1000 Hz rate.
+        """
+        raw = self._raw
+        self._i2c.readfrom_mem_into(self._addr, H3LIS331DL_REG_OUT_X_L | H3LIS331DL_AUTO_INCREMENT, raw)
+        for a in range(3):
+            v = raw[2 * a] | (raw[2 * a + 1] << 8)
+            if v & 0x8000:
+                v -= 0x10000
+            buf[offset + a] = v
+        return buf
+    
     def read_accl_g(self):
         """Read acceleration data in g units"""
         raw_data = self.read_accl()
@@ -7,8 +7,13 @@ from machine import Pin
 import neopixel
 from Day3 import lis3dh
 from Day4 import encoder
-import math
+from Day4.knn import KDTree, Standardizer, QuantizedKNN
+from Day4 import modelstore
+from Day4.capture import Capture
+from Day4.classify import NearestCentroid, GaussianNB
 import time
+import stagetime
+from stagetime import stage
 
 
 STATE_TRAIN = False
@@ -20,6 +25,39 @@ count = 0
 data = [[0,0,1],[100,50,2], [50,200,3],[2,4,1],[95,45,2], [48,180,3],[8,2,1],[89,30,2], [35,190,3],[20,10,1],[80,65,2], [35,160,3]]
 color_LUT = {1:(0,0,100),2:(0,100,0),3:(100,0,0)}
 
+MODEL_FILE = "knn_demo.mdl"
+LABEL_NAMES = ("none", "blue", "green", "red")
+
+# accel*100 and encoder counts have very different ranges: scale each
+# feature by its running 1/std so neither dominates the distance
+try:
+    model, _ = modelstore.load(MODEL_FILE)
+    print("Loaded", len(model), "training points from", MODEL_FILE)
+except (OSError, ValueError):
+    model = KDTree(dims=2, k=3, scaler=Standardizer(2))
+    for d in data:
+        model.add(d[:2], d[2])
+    model.rebalance()
+saved_points = len(model)
+
+# "knn" searches the k-d tree; "fixed" scans every point on int16 columns
+# quantised from the training set (viper kernel, no allocation per query;
+# the quantisation is rebuilt over all points whenever play mode starts);
+# "centroid" and "bayes" compile the same training set into per-class
+# tables and only compare against 3 classes
+CLASSIFIER = "fixed"
+
+def build_classifier():
+    if CLASSIFIER == "fixed":
+        return QuantizedKNN(model)
+    elif CLASSIFIER == "centroid":
+        return NearestCentroid.from_points(model, scale=model.scale)
+    elif CLASSIFIER == "bayes":
+        return GaussianNB.from_points(model)
+    return model
+
+classifier = build_classifier()
+
 
 motor = encoder.Motor(27, 14, 32,39)
 h3lis331dl = lis3dh.H3LIS331DL(sda_pin=21, scl_pin=22)
@@ -29,88 +67,86 @@ button_Train =  Pin(35, Pin.IN, Pin.PULL_UP)
 button_Play = Pin(34, Pin.IN, Pin.PULL_UP)
 
 debounce_filter = 100
-last_entered_time = 0
 
-def trainButton(p):
-    #record the values
-    global data
+def trainButton(t):
+    #record the values (runs from the capture worker, not the IRQ)
     global count
     
-    #to control debounce
-    global last_entered_time
-    entered_time = time.ticks_ms() # time this function was called
-    if((time.ticks_ms() - last_entered_time) < debounce_filter):
-        return
-    last_entered_time = entered_time
-    
     print("pressed")
-    data.append([h3lis331dl.read_accl_g()['x']*100, motor.pos() , color_LUT[count%3]])
+    label = count%3 + 1
+    point = (h3lis331dl.read_accl_g()['x']*100, motor.pos())
+    model.add(point, label)
+    if classifier is not model:
+        classifier.add(point, label)
     count +=1
     
     
+play_pending = False
+
 def playButton(p):
+    # IRQ: only flag the press; the main loop rebalances (which allocates)
+    # and switches to play mode, never in the middle of a predict()
+    global play_pending
+    play_pending = True
+
+
+def start_play():
     #enable play mode
     global STATE_PLAY
     global STATE_TRAIN
+    global classifier
+    model.rebalance()   # button presses arrive in runs, which can deepen the tree
+    if CLASSIFIER == "fixed":
+        # re-quantise over the whole training set: points trained since the
+        # last build were squeezed into the old range and clamped at its ends
+        classifier = build_classifier()
+    print(len(model), "training points, tree depth", model.depth)
+    train.report()
     STATE_TRAIN = False
     STATE_PLAY = True
-    print(data)
 
     
     
-button_Train.irq(trigger=Pin.IRQ_RISING, handler=trainButton)
+# the IRQ only timestamps the press; trainButton runs later in the main context
+train = Capture(button_Train, trainButton, debounce_ms=debounce_filter)
 button_Play.irq(trigger=Pin.IRQ_RISING, handler=playButton)
 
 
 #for K = 1
 def nearest_neighbor(x,y):
-    dist_min = 100000
-    for index, d in enumerate(data):
-        dist = math.sqrt((x-d[0])**2 + (y-d[1])**2)
-        if(dist < dist_min):
-            dist_min = dist
-            col = d[2]
-        
-    return col
+    return classifier.predict((x, y), 1)
 
 
-# for KNN
+# for KNN: k-d tree search, squared distances, majority vote
 def k_nearest_neighbor(x,y, k =1):
-    dist_min = 100000
-    distances = []
-    for index, d in enumerate(data):
-        dist = math.sqrt((x-d[0])**2 + (y-d[1])**2)
-        distances.append([dist,index])
-    
-    
-    distances.sort()
-    distances = distances[:k] #get k distances
-    print("distances", distances)
-    classes = []
-    for dist in distances:
-        print(data[dist[1]])
-        classes.append(data[dist[1]][2])
-    print("k classes", classes)
-    print("max classes ", max(classes))
-    
-    col = max(classes)
-    return col
+    return classifier.predict((x, y), k)
 
 
 
 while True:
+    train.poll()
+    if play_pending:
+        play_pending = False
+        start_play()
+    if len(model) != saved_points:     # new training points: keep them across resets
+        modelstore.save(MODEL_FILE, model, LABEL_NAMES)
+        saved_points = len(model)
     if(STATE_TRAIN):
-        np[0]=color_LUT[count%3]
+        np[0]=color_LUT[count%3 + 1]
         np.write()
     if(STATE_PLAY):
         #do something else
-        accl_g = h3lis331dl.read_accl_g()['x']
+        with stage("accel"):
+            accl_g = h3lis331dl.read_accl_g()['x']
         motor_position = motor.pos()
         
         
-        what_color = k_nearest_neighbor(accl_g*100, motor_position, 3)
-        np[0]=color_LUT[what_color]
-        np.write()
+        with stage("knn"):
+            what_color = k_nearest_neighbor(accl_g*100, motor_position, 3)
+        with stage("neopixel"):
+            np[0]=color_LUT[what_color]
+            np.write()
+        stagetime.poll_serial()  # "p" prints stage timings
         time.sleep(0.1)
         
     
@@ -0,0 +1,86 @@
+import micropython
+import time
+from array import array
+from machine import Pin
+
+
+class Capture:
+    """
+    Button-triggered sample capture with the work kept out of the IRQ.
+
+    The pin interrupt only debounces, stores the press time in a small
+    ring and schedules the worker with micropython.schedule. The worker
+    then runs in the main context and calls handler(t_ms) for up to
+    `batch` queued presses per run, where the sensor read, storage and
+    printing happen. Presses that arrive with the ring full are counted
+    as lost, not queued.
+
+        train = Capture(Pin(35, Pin.IN, Pin.PULL_UP), take_sample)
+    """
+
+    def __init__(self, pin, handler, debounce_ms=150, depth=8, batch=2,
+                 trigger=Pin.IRQ_RISING):
+        self.handler = handler
+        self.debounce_ms = debounce_ms
+        self.batch = batch
+        self.times = array("L", [0] * depth)
+        # only the IRQ advances pushed and only the worker advances popped,
+        # so neither needs interrupts disabled
+        self.pushed = 0
+        self.popped = 0
+        self.scheduled = False
+        self.last = time.ticks_ms()
+        self._work_ref = self._work     # bound once: no allocation in the IRQ
+        # statistics
+        self.captured = 0
+        self.lost = 0
+        self.bounced = 0
+        self.lag_max = 0
+        pin.irq(trigger=trigger, handler=self._irq, hard=True)
+
+    def _irq(self, pin):
+        t = time.ticks_ms()
+        if time.ticks_diff(t, self.last) < self.debounce_ms:
+            self.bounced += 1
+            return
+        self.last = t
+        n = len(self.times)
+        if self.pushed - self.popped == n:
+            self.lost += 1
+            return
+        self.times[self.pushed % n] = t
+        self.pushed += 1
+        if not self.scheduled:
+            self.scheduled = True
+            try:
+                micropython.schedule(self._work_ref, 0)
+            except RuntimeError:        # schedule queue full: retried on the next press
+                self.scheduled = False
+
+    def _work(self, arg):
+        self.scheduled = False
+        for _ in range(self.batch):
+            if self.pushed == self.popped:
+                return
+            t = self.times[self.popped % len(self.times)]
+            self.popped += 1
+            lag = time.ticks_diff(time.ticks_ms(), t)
+            if lag > self.lag_max:
+                self.lag_max = lag
+            self.captured += 1
+            self.handler(t)
+        if self.pushed != self.popped and not self.scheduled:
+            self.scheduled = True   # more waiting: let the main loop run first
+            try:
+                micropython.schedule(self._work_ref, 0)
+            except RuntimeError:
+                self.scheduled = False
+
+    def poll(self):
+        """Run the worker from the main loop, in case a schedule was refused."""
+        if self.pushed != self.popped and not self.scheduled:
+            self._work(0)
+
+    def report(self):
+        print("Captured %d, lost %d (queue full), bounced %d, max lag %d ms"
+              % (self.captured, self.lost, self.bounced, self.lag_max))
@@ -0,0 +1,179 @@
+# Compiled classifiers: O(classes) inference instead of a scan of every sample
+#
+# Both keep per-class running statistics that are updated on add(), so
+# they can be trained from the button like the KNN engine, or compiled
+# from an existing KNN training set with from_points(). They share the
+# KNN API (add(x, label), predict(q), len()), labels are ints >= 0, and
+# the play loops can swap one for another.
+
+import math
+from array import array
+from Day4.knn import SHIFT, ONE
+
+
+def read_axes(accel, out, scale=1000):
+    """All three H3LIS331DL axes into out (array('i', 3)), in g * scale."""
+    g = accel.read_accl_g()
+    out[0] = int(g['x'] * scale)
+    out[1] = int(g['y'] * scale)
+    out[2] = int(g['z'] * scale)
+    return out
+
+
+class _PerClass:
+    """Per-class counts and running feature mean/variance (Welford), shared
+    by both classifiers."""
+
+    def __init__(self, dims):
+        self.dims = dims
+        self.clear()
+
+    def __len__(self):
+        return self.n
+
+    def clear(self):
+        self.n = 0
+        self.count = array("H")
+        self.mean = []          # per class: [dims floats]
+        self.m2 = []
+
+    def _grow(self, label):
+        while len(self.count) <= label:
+            self.count.append(0)
+            self.mean.append([0.0] * self.dims)
+            self.m2.append([0.0] * self.dims)
+            self._grow_tables()
+
+    def add(self, x, label):
+        self._grow(label)
+        self.n += 1
+        self.count[label] += 1
+        c = self.count[label]
+        mean, m2 = self.mean[label], self.m2[label]
+        for j in range(self.dims):
+            v = int(x[j])
+            d = v - mean[j]
+            mean[j] += d / c
+            m2[j] += d * (v - mean[j])
+        self._compile(label)
+
+    @classmethod
+    def from_points(cls, model, **kwargs):
+        """Compile the training points of a KNN/KDTree."""
+        d = model.dims
+        c = cls(d, **kwargs)
+        X, y = model.X, model.y
+        for i in range(len(y)):
+            c.add(X[i * d:(i + 1) * d], y[i])
+        return c
+
+
+class NearestCentroid(_PerClass):
+    """
+    Predicts the class whose mean point is nearest, with the same scaled
+    squared distance as the KNN engine. Pass a KNN's .scale array to share
+    its standardisation (it keeps updating as the KNN is trained).
+    """
+
+    def __init__(self, dims=2, scale=None):
+        self.scale = scale if scale is not None else array("i", [ONE] * dims)
+        super().__init__(dims)
+
+    def clear(self):
+        super().clear()
+        self.centroid = array("i")
+
+    def _grow_tables(self):
+        for _ in range(self.dims):
+            self.centroid.append(0)
+
+    def _compile(self, label):
+        o = label * self.dims
+        for j in range(self.dims):
+            self.centroid[o + j] = round(self.mean[label][j])
+
+    def predict(self, q, k=None):
+        """Nearest class (k is accepted for KNN compatibility and ignored).
+        Returns None if untrained."""
+        dims, cen, sc, count = self.dims, self.centroid, self.scale, self.count
+        best, best_d = None, 0
+        o = 0
+        for c in range(len(count)):
+            if count[c]:
+                d = 0
+                for j in range(dims):
+                    t = ((cen[o + j] - int(q[j])) * sc[j]) >> SHIFT
+                    d += t * t
+                if best is None or d < best_d:
+                    best, best_d = c, d
+            o += dims
+        return best
+
+
+class GaussianNB(_PerClass):
+    """
+    Gaussian naive Bayes with integer inference.
+
+    Per class and feature, add() keeps a running mean and variance and
+    compiles them to an integer mean and a fixed-point 1/std scale. A query
+    then scores each class as
+
+        sum_j ((q_j - mean_j) * scale_j >> SHIFT)^2 + bias
+
+    which is unit^2 * (z^2 summed + 2 ln std - 2 ln prior), i.e. the
+    negative log-likelihood up to a shared constant; the lowest wins.
+    """
+
+    def __init__(self, dims=2, unit=100, min_std=1.0):
+        self.unit = unit
+        self.min_std = min_std
+        super().__init__(dims)
+
+    def clear(self):
+        super().clear()
+        self.mu = array("i")
+        self.s = array("i")
+        self.bias = array("l")
+
+    def _grow_tables(self):
+        for _ in range(self.dims):
+            self.mu.append(0)
+            self.s.append(ONE)
+        self.bias.append(0)
+
+    def _std(self, label, j):
+        c = self.count[label]
+        var = self.m2[label][j] / (c - 1) if c > 1 else 0.0
+        return max(self.min_std, math.sqrt(var))
+
+    def _compile(self, label):
+        o = label * self.dims
+        for j in range(self.dims):
+            std = self._std(label, j)
+            self.mu[o + j] = round(self.mean[label][j])
+            self.s[o + j] = int(ONE * self.unit / std + 0.5)
+        # priors change for every class when one grows
+        u2 = self.unit * self.unit
+        for c in range(len(self.count)):
+            if self.count[c]:
+                log_std = 0.0
+                for j in range(self.dims):
+                    log_std += math.log(self._std(c, j))
+                self.bias[c] = int(u2 * (2 * log_std - 2 * math.log(self.count[c] / self.n)))
+
+    def predict(self, q, k=None):
+        """Most likely class (k is accepted for KNN compatibility and ignored).
+        Returns None if untrained."""
+        dims, mu, s, bias, count = self.dims, self.mu, self.s, self.bias, self.count
+        best, best_d = None, 0
+        o = 0
+        for c in range(len(count)):
+            if count[c]:
+                d = bias[c]
+                for j in range(dims):
+                    t = ((int(q[j]) - mu[o + j]) * s[o + j]) >> SHIFT
+                    d += t * t
+                if best is None or d < best_d:
+                    best, best_d = c, d
+            o += dims
+        return best
@@ -0,0 +1,276 @@
+"""
+Offline evaluation of the Day4 classifiers (run with CPython on the host).
+
+For every dataset this runs stratified k-fold cross-validation of each
+classifier and prints accuracy, a confusion matrix per classifier and
+the per-query latency as the training set grows. If NumPy is installed,
+vectorised reference implementations check the KNN neighbour distances
+and the centroid / naive Bayes predictions.
+
+    python Day4/evaluate.py                      # synthetic datasets
+    python Day4/evaluate.py mltrain.mdl data.csv --folds 10
+
+Datasets are model files copied off the board (modelstore: the stored
+training points are the dataset) or CSV files with the feature columns
+followed by an integer label column (a header row is skipped).
+
+Classifiers:
+  reference   one point per class, the first one trained (trainnoml.py)
+  sorted-1d   SortedKNN1D, k=3 (mltrain.py / mltrainy.py), 1-D data only
+  knn k=1/3/5 linear-scan KNN, raw features
+  kdtree+std  KDTree with Standardizer, k=3 (KNN_demo.py)
+  centroid    NearestCentroid
+  bayes       GaussianNB
+"""
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Day4 import modelstore
+from Day4.knn import KNN, KDTree, SortedKNN1D, Standardizer
+from Day4.classify import NearestCentroid, GaussianNB
+
+SIZES = (30, 100, 300, 1000, 3000)
+LATENCY_QUERIES = 300
+
+
+# ---- Datasets: (name, X as int tuples, y as label ids, label names) ----
+def synthetic_tilt_1d(n, rng):
+    """mltrain-style X-axis tilt in milli-g: forward / stop / back, overlapping."""
+    centres = (350, 0, -350)
+    X, y = [], []
+    for i in range(n):
+        c = i % 3
+        X.append((int(rng.gauss(centres[c], 140)),))
+        y.append(c)
+    return "tilt-1d (synthetic)", X, y, ("forward", "stop", "back")
+
+
+def synthetic_tilt_3d(n, rng):
+    """Four tilt directions on three axes in milli-g, with unequal spreads."""
+    classes = (((0, 0, 1000), (60, 60, 60)), ((700, 0, 700), (150, 80, 80)),
+               ((0, -700, 700), (50, 250, 50)), ((-700, 0, 700), (250, 50, 50)))
+    X, y = [], []
+    for i in range(n):
+        c = i % 4
+        m, s = classes[c]
+        X.append(tuple(int(rng.gauss(m[j], s[j])) for j in range(3)))
+        y.append(c)
+    return "tilt-3d (synthetic)", X, y, ("flat", "right", "forward", "left")
+
+
+def load_dataset(path):
+    name = os.path.basename(path)
+    if path.endswith(".csv"):
+        X, y = [], []
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                try:
+                    vals = [int(float(v)) for v in row]
+                except ValueError:
+                    continue    # header
+                X.append(tuple(vals[:-1]))
+                y.append(vals[-1])
+        return name, X, y, ()
+    model, names = modelstore.load(path)
+    if isinstance(model, SortedKNN1D):
+        return name, [(v,) for v in model.x], list(model.y), names
+    d = model.dims
+    return name, [tuple(model.X[i * d:(i + 1) * d]) for i in range(len(model))], list(model.y), names
+
+
+# ---- Classifiers, all as add(x, label) / predict(x) ----
+class Reference:
+    """trainnoml.py: the first sample of each class is its reference."""
+
+    def __init__(self, dims):
+        self.refs = {}
+
+    def add(self, x, label):
+        self.refs.setdefault(label, x)
+
+    def predict(self, q):
+        return min(self.refs, key=lambda c: sum((a - b) ** 2 for a, b in zip(self.refs[c], q)))
+
+
+class Sorted1D:
+    def __init__(self, dims, labels):
+        self.model = SortedKNN1D(range(labels), k=3, scale=1)
+
+    def add(self, x, label):
+        self.model.add(x[0], label)
+
+    def predict(self, q):
+        return self.model.predict(q[0])
+
+
+def classifiers(dims, labels):
+    out = [("reference", lambda: Reference(dims))]
+    if dims == 1:
+        out.append(("sorted-1d k=3", lambda: Sorted1D(dims, labels)))
+    for k in (1, 3, 5):
+        out.append(("knn k=%d" % k, lambda k=k: KNN(dims, k)))
+    out += [
+        ("kdtree+std k=3", lambda: KDTree(dims, 3, scaler=Standardizer(dims))),
+        ("centroid", lambda: NearestCentroid(dims)),
+        ("bayes", lambda: GaussianNB(dims)),
+    ]
+    return out
+
+
+# ---- Cross-validation ----
+def folds_of(y, folds, rng):
+    """Stratified fold number for every sample."""
+    fold = [0] * len(y)
+    by_class = {}
+    for i, c in enumerate(y):
+        by_class.setdefault(c, []).append(i)
+    for idx in by_class.values():
+        rng.shuffle(idx)
+        for j, i in enumerate(idx):
+            fold[i] = j % folds
+    return fold
+
+
+def cross_validate(make, X, y, labels, folds, rng):
+    fold = folds_of(y, folds, rng)
+    accs = []
+    confusion = [[0] * labels for _ in range(labels)]
+    for f in range(folds):
+        model = make()
+        for i in range(len(y)):
+            if fold[i] != f:
+                model.add(X[i], y[i])
+        if hasattr(model, "rebalance"):
+            model.rebalance()
+        right = total = 0
+        for i in range(len(y)):
+            if fold[i] == f:
+                p = model.predict(X[i])
+                if p is not None:
+                    confusion[y[i]][p] += 1
+                right += p == y[i]
+                total += 1
+        if total:
+            accs.append(right / total)
+    mean = sum(accs) / len(accs)
+    sd = math.sqrt(sum((a - mean) ** 2 for a in accs) / len(accs))
+    return mean, sd, confusion
+
+
+def latency_us(make, X, y, n, rng):
+    model = make()
+    idx = [rng.randrange(len(y)) for _ in range(n)] if n > len(y) else rng.sample(range(len(y)), n)
+    for i in idx:
+        model.add(X[i], y[i])
+    if hasattr(model, "rebalance"):
+        model.rebalance()
+    queries = [X[rng.randrange(len(y))] for _ in range(LATENCY_QUERIES)]
+    t0 = time.perf_counter()
+    for q in queries:
+        model.predict(q)
+    return (time.perf_counter() - t0) * 1e6 / len(queries)
+
+
+# ---- NumPy reference checks ----
+def numpy_checks(X, y, rng):
+    try:
+        import numpy as np
+    except ImportError:
+        print("  (NumPy not installed: reference checks skipped)")
+        return
+    n = len(y)
+    split = rng.sample(range(n), n // 2)
+    held = set(split)
+    train = [i for i in range(n) if i not in held]
+    Xtr = np.array([X[i] for i in train], dtype=np.int64)
+    ytr = np.array([y[i] for i in train])
+    Xte = np.array([X[i] for i in split], dtype=np.int64)
+    dims = Xtr.shape[1]
+
+    # KNN: the k nearest squared distances must match exactly
+    for k in (1, 3, 5):
+        model = KNN(dims, k)
+        for i in train:
+            model.add(X[i], y[i])
+        d = ((Xte[:, None, :] - Xtr[None, :, :]) ** 2).sum(axis=2)
+        ref = np.sort(np.partition(d, k - 1, axis=1)[:, :k], axis=1)
+        same = 0
+        for row, q in enumerate(Xte):
+            m = model.nearest(q.tolist(), k)
+            same += list(model.best_d[:m]) == ref[row].tolist()
+        print("  numpy knn k=%d: neighbour distances identical for %d/%d queries" % (k, same, len(Xte)))
+
+    classes = np.unique(ytr)
+    # nearest centroid, float means
+    means = np.array([Xtr[ytr == c].mean(axis=0) for c in classes])
+    ref = classes[((Xte[:, None, :] - means[None]) ** 2).sum(axis=2).argmin(axis=1)]
+    model = NearestCentroid(dims)
+    for i in train:
+        model.add(X[i], y[i])
+    got = np.array([model.predict(q.tolist()) for q in Xte])
+    print("  numpy centroid: %.1f%% of predictions agree" % (100 * (got == ref).mean()))
+
+    # Gaussian naive Bayes, float log-likelihood
+    var = np.array([np.maximum(Xtr[ytr == c].var(axis=0, ddof=1), 1.0) for c in classes])
+    prior = np.array([(ytr == c).mean() for c in classes])
+    ll = (-0.5 * (((Xte[:, None, :] - means[None]) ** 2) / var[None]).sum(axis=2)
+          - 0.5 * np.log(var).sum(axis=1)[None] + np.log(prior)[None])
+    ref = classes[ll.argmax(axis=1)]
+    model = GaussianNB(dims)
+    for i in train:
+        model.add(X[i], y[i])
+    got = np.array([model.predict(q.tolist()) for q in Xte])
+    print("  numpy bayes: %.1f%% of predictions agree" % (100 * (got == ref).mean()))
+
+
+# ---- Report ----
+def evaluate(dataset, folds, sizes, rng):
+    name, X, y, names = dataset
+    labels = max(y) + 1
+    dims = len(X[0])
+    print("\n== %s: %d samples, %d feature(s), %d classes ==" % (name, len(y), dims, len(set(y))))
+    cands = classifiers(dims, labels)
+    present = sorted(set(y))
+    header = " ".join("%6s" % (names[c][:6] if c < len(names) else c) for c in present)
+    for cname, make in cands:
+        mean, sd, conf = cross_validate(make, X, y, labels, folds, rng)
+        print("\n%-16s accuracy %5.1f%% +- %4.1f  (%d-fold)" % (cname, 100 * mean, 100 * sd, folds))
+        print("  %8s %s   <- predicted" % ("true", header))
+        for c in present:
+            label = names[c][:8] if c < len(names) else str(c)
+            print("  %8s %s" % (label, " ".join("%6d" % conf[c][p] for p in present)))
+
+    sizes = [s for s in sizes if s <= len(y)] or [len(y)]
+    print("\nus per query by training-set size")
+    print("  %-16s" % "" + "".join("%9d" % s for s in sizes))
+    for cname, make in cands:
+        row = [latency_us(make, X, y, s, rng) for s in sizes]
+        print("  %-16s" % cname + "".join("%9.1f" % t for t in row))
+    numpy_checks(X, y, rng)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("datasets", nargs="*", help="model files (.mdl) or CSV files")
+    ap.add_argument("--folds", type=int, default=5)
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)), help="training-set sizes for the latency table")
+    ap.add_argument("--seed", type=int, default=43)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    if args.datasets:
+        datasets = [load_dataset(p) for p in args.datasets]
+    else:
+        datasets = [synthetic_tilt_1d(max(sizes), rng), synthetic_tilt_3d(max(sizes), rng)]
+    for d in datasets:
+        evaluate(d, args.folds, sizes, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Sliding-window features for gesture recognition
+#
+# A Window keeps the last `size` multi-axis samples in a ring and keeps
+# running sums per axis, so adding a sample (and dropping the oldest)
+# updates the features in O(axes), whatever the window length:
+#   mean, standard deviation, RMS energy and zero crossings.
+# Zero crossings are counted about a slow moving average of each axis,
+# so gravity and tilt do not count as motion. The features come out as
+# integers for the Day4/knn engine (use it with a Standardizer: the
+# features have very different ranges).
+
+import math
+from array import array
+
+FEATURES = ("mean", "std", "rms", "zc")
+
+
+class Window:
+    def __init__(self, axes=3, size=32, baseline_shift=4):
+        """
+        Args:
+            axes (int): values per sample.
+            size (int): window length in samples (at least 2).
+            baseline_shift (int): the zero-crossing baseline is an EMA with
+                weight 1 / 2**baseline_shift.
+        """
+        self.axes = axes
+        self.size = size
+        self.shift = baseline_shift
+        self.buf = array("h", [0] * (axes * size))
+        self.sign = bytearray(axes * size)
+        self.base = array("l", [0] * axes)     # baseline << shift
+        self.sum = [0] * axes
+        self.sumsq = [0] * axes
+        self.zc = [0] * axes
+        self.n = 0          # samples in the window
+        self.pos = 0        # slot the next sample goes in (the oldest once full)
+        self.count = 0      # samples pushed in total
+
+    def __len__(self):
+        return self.n
+
+    def push(self, sample):
+        """Add one sample (a sequence of `axes` ints in -32768..32767)."""
+        axes, size, sh = self.axes, self.size, self.shift
+        buf, sign, base = self.buf, self.sign, self.base
+        pos = self.pos
+        o = pos * axes
+        prev = ((pos - 1) % size) * axes
+        nxt = ((pos + 1) % size) * axes
+        full = self.n == size
+        for a in range(axes):
+            v = sample[a]
+            if full:
+                old = buf[o + a]
+                self.sum[a] -= old
+                self.sumsq[a] -= old * old
+                if sign[o + a] != sign[nxt + a]:
+                    self.zc[a] -= 1     # the oldest pair leaves the window
+            if self.count == 0:
+                base[a] = v << sh
+            else:
+                base[a] += ((v << sh) - base[a]) >> sh
+            s = 1 if (v << sh) >= base[a] else 0
+            if self.n and s != sign[prev + a]:
+                self.zc[a] += 1
+            buf[o + a] = v
+            sign[o + a] = s
+            self.sum[a] += v
+            self.sumsq[a] += v * v
+        self.pos = (pos + 1) % size
+        if not full:
+            self.n += 1
+        self.count += 1
+
+    def features(self, out):
+        """
+        Write mean, std, rms and zero crossings for each axis into out
+        (an array of 4 * axes ints, axis-major). Returns out.
+        """
+        n = self.n
+        if n == 0:
+            return out
+        o = 0
+        for a in range(self.axes):
+            s, sq = self.sum[a], self.sumsq[a]
+            var = (sq * n - s * s) // (n * n)
+            out[o] = s // n
+            out[o + 1] = int(math.sqrt(var)) if var > 0 else 0
+            out[o + 2] = int(math.sqrt(sq // n))
+            out[o + 3] = self.zc[a]
+            o += 4
+        return out
+
+    def reset(self):
+        self.__init__(self.axes, self.size, self.shift)
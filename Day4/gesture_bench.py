@@ -0,0 +1,117 @@
+"""
+Gesture feature benchmark (run with CPython on the host).
+
+Synthetic 3-axis accelerometer streams (100 Hz, units of 10 mg) for three
+gestures are pushed through gesture.Window. It reports:
+  - feature extraction throughput of the running-sum Window against
+    recomputing the features over the whole window on every sample,
+    for several window lengths (and checks both give the same numbers);
+  - hold-out accuracy of KDTree + Standardizer on the window features.
+
+    python Day4/gesture_bench.py
+"""
+import math
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Day4.gesture import Window
+from Day4.knn import KDTree, Standardizer
+
+RATE = 100
+GESTURES = ("still", "shake", "circle")
+
+
+def stream(gesture, seconds, rng):
+    """Samples of one gesture: gravity on z, plus the motion, plus noise."""
+    f = rng.uniform(0.8, 1.2)
+    for i in range(int(seconds * RATE)):
+        t = i / RATE
+        x = y = 0.0
+        z = 100.0
+        if gesture == "shake":
+            x = 250 * math.sin(2 * math.pi * 4 * f * t)
+        elif gesture == "circle":
+            x = 120 * math.cos(2 * math.pi * 1.2 * f * t)
+            y = 120 * math.sin(2 * math.pi * 1.2 * f * t)
+        yield (int(x + rng.gauss(0, 4)), int(y + rng.gauss(0, 4)), int(z + rng.gauss(0, 4)))
+
+
+def naive_features(samples, signs, axes):
+    """Reference: recompute everything from the window contents."""
+    n = len(samples)
+    out = []
+    for a in range(axes):
+        col = [s[a] for s in samples]
+        s, sq = sum(col), sum(v * v for v in col)
+        var = (sq * n - s * s) // (n * n)
+        zc = sum(1 for i in range(1, n) if signs[i][a] != signs[i - 1][a])
+        out += [s // n, int(math.sqrt(var)) if var > 0 else 0, int(math.sqrt(sq // n)), zc]
+    return out
+
+
+def throughput(size, data):
+    win = Window(3, size)
+    feats = array("i", [0] * 12)
+    t0 = time.perf_counter()
+    for s in data:
+        win.push(s)
+        win.features(feats)
+    fast = len(data) / (time.perf_counter() - t0)
+
+    win = Window(3, size)
+    hist = []
+    mismatches = 0
+    t0 = time.perf_counter()
+    for s in data:
+        win.push(s)
+        last = (win.pos - 1) % size
+        hist.append((s, tuple(win.sign[last * 3:last * 3 + 3])))
+        window = hist[-size:]
+        ref = naive_features([w[0] for w in window], [w[1] for w in window], 3)
+        mismatches += ref != list(win.features(feats))
+    slow = len(data) / (time.perf_counter() - t0)
+    return fast, slow, mismatches
+
+
+def accuracy(rng, size=32, hop=8):
+    def windows(gesture, seconds):
+        win = Window(3, size)
+        feats = array("i", [0] * 12)
+        for s in stream(gesture, seconds, rng):
+            win.push(s)
+            if len(win) == size and win.count % hop == 0:
+                yield tuple(win.features(feats))
+
+    model = KDTree(dims=12, k=3, scaler=Standardizer(12))
+    for label, g in enumerate(GESTURES):
+        for _ in range(3):      # three short training takes per gesture
+            for f in windows(g, 2):
+                model.add(f, label)
+    model.rebalance()
+    right = total = 0
+    for label, g in enumerate(GESTURES):
+        for f in windows(g, 10):
+            right += model.predict(f) == label
+            total += 1
+    return len(model), right * 100 / total
+
+
+def main():
+    rng = random.Random(42)
+    data = []
+    for g in GESTURES * 4:
+        data += list(stream(g, 2, rng))
+    print("%8s %16s %16s %8s %10s" % ("window", "running sums/s", "recompute/s", "speedup", "mismatch"))
+    for size in (16, 32, 64, 128):
+        fast, slow, bad = throughput(size, data)
+        print("%8d %16.0f %16.0f %7.1fx %10d" % (size, fast, slow, fast / slow, bad))
+    n, acc = accuracy(rng)
+    print("KDTree on 32-sample windows: %d training windows, %.1f%% hold-out accuracy" % (n, acc))
+
+
+if __name__ == "__main__":
+    main()
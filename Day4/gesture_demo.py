@@ -0,0 +1,94 @@
+# Gesture recognition demo
+#
+# The accelerometer is sampled at 100 Hz into a sliding window of 32
+# samples (0.32 s). Every HOP samples the window's per-axis mean, std,
+# RMS and zero crossings are classified by KNN and shown on the LED.
+#
+# Train: press the train button, then make the gesture; the window that
+# ends WINDOW samples after the press is recorded. Presses cycle through
+# the three gestures (LED colour shows which one is being trained).
+
+from machine import Pin
+import neopixel
+import time
+from array import array
+from Day3 import lis3dh
+from Day4.knn import KDTree, Standardizer
+from Day4 import modelstore
+from Day4.capture import Capture
+from Day4.classify import read_axes
+from Day4.gesture import Window
+from scheduler import FixedRateScheduler
+
+SAMPLE_MS = 10
+WINDOW = 32
+HOP = 8
+MODEL_FILE = "gesture.mdl"
+GESTURES = ("still", "shake", "circle")
+color_LUT = {0: (0, 0, 100), 1: (0, 100, 0), 2: (100, 0, 0)}
+
+h3lis331dl = lis3dh.H3LIS331DL(sda_pin=21, scl_pin=22)
+np = neopixel.NeoPixel(Pin(15), 2)
+
+win = Window(axes=3, size=WINDOW)
+sample = array("i", [0, 0, 0])
+feats = array("i", [0] * (4 * 3))
+
+try:
+    model, _ = modelstore.load(MODEL_FILE)
+    print("Loaded", len(model), "gesture windows from", MODEL_FILE)
+except (OSError, ValueError):
+    model = KDTree(dims=len(feats), k=3, scaler=Standardizer(len(feats)))
+
+count = 0               # train presses so far: gesture = count % 3
+record_at = -1          # win.count at which to record the training window
+label = 0
+what = None
+
+
+def trainButton(t):
+    # runs from the capture worker after a press, not in the interrupt handler
+    global count, record_at, label
+    label = count % len(GESTURES)
+    count += 1
+    record_at = win.count + WINDOW
+    print("Make the", GESTURES[label], "gesture")
+
+
+train = Capture(Pin(35, Pin.IN, Pin.PULL_UP), trainButton)
+
+
+def control_step(now):
+    global record_at, what
+    read_axes(h3lis331dl, sample, 100)      # units of 10 mg
+    win.push(sample)
+    if record_at >= 0 and win.count >= record_at:
+        model.add(win.features(feats), label)
+        record_at = -1
+        print("Recorded", GESTURES[label], "window", len(model))
+        # saved here, between samples, so the model never changes mid-save
+        # (costs one overrun per training press)
+        model.rebalance()
+        modelstore.save(MODEL_FILE, model, GESTURES)
+    elif len(win) == WINDOW and win.count % HOP == 0 and len(model):
+        guess = model.predict(win.features(feats))
+        if guess != what:
+            what = guess
+            np[0] = color_LUT[what]
+            np.write()
+
+
+# A hardware Timer paces the sampling; overruns and jitter are printed on exit.
+sched = FixedRateScheduler(SAMPLE_MS, control_step)
+sched.start()
+try:
+    while True:
+        train.poll()
+        if record_at >= 0:
+            np[0] = color_LUT[label]
+            np.write()
+        time.sleep(0.2)
+finally:
+    sched.stop()
+    sched.report()
+    train.report()
@@ -0,0 +1,561 @@
+# k Nearest Neighbor engine
+#
+# Training points are kept in flat arrays (dims ints per point + one label).
+# A query uses squared integer distances (no sqrt) and keeps the k best in
+# small preallocated arrays by insertion, so nothing is allocated per
+# training point and nothing is sorted.
+#
+# Each feature difference is multiplied by a fixed-point scale (>> SHIFT)
+# before squaring. With a Standardizer the scales are 1/std per feature,
+# so features in different units (g*100, encoder counts) weigh the same.
+
+import sys
+from array import array
+
+SHIFT = 12
+ONE = 1 << SHIFT        # scale factor 1.0
+
+
+class Standardizer:
+    """
+    Running per-feature mean and variance (Welford), updated one training
+    point at a time, kept as fixed-point scales for the distance kernel.
+
+    Standardising both points of a difference subtracts the same mean from
+    each, so only the 1/std factor matters for distances: scale[j] is
+    ONE * unit / std_j, i.e. one standard deviation becomes `unit` after
+    the shift. Until a feature has two distinct values its scale stays ONE.
+    """
+
+    def __init__(self, dims=2, unit=100, min_std=1.0):
+        self.dims = dims
+        self.unit = unit
+        self.min_std = min_std
+        self.n = 0
+        self.mean = [0.0] * dims
+        self.m2 = [0.0] * dims
+        self.scale = array("i", [ONE] * dims)
+
+    def add(self, x):
+        self.n += 1
+        n = self.n
+        for j in range(self.dims):
+            v = x[j]
+            d = v - self.mean[j]
+            self.mean[j] += d / n
+            self.m2[j] += d * (v - self.mean[j])
+            self.rescale(j)
+
+    def rescale(self, j):
+        """Recompute scale[j] from the running statistics."""
+        if self.n > 1 and self.m2[j] > 0:
+            std = max(self.min_std, (self.m2[j] / (self.n - 1)) ** 0.5)
+            self.scale[j] = int(ONE * self.unit / std + 0.5)
+
+    def std(self, j):
+        return (self.m2[j] / (self.n - 1)) ** 0.5 if self.n > 1 else 0.0
+
+    def transform(self, x, out):
+        """Standardised copy of x into out (array('i')), in units of 1/unit std."""
+        for j in range(self.dims):
+            out[j] = int((x[j] - self.mean[j]) * self.scale[j]) >> SHIFT
+        return out
+
+
+class KNN:
+    def __init__(self, dims=2, k=3, weighted=False, scaler=None):
+        """
+        Args:
+            dims (int): number of features per point.
+            k (int): largest k a query may ask for (default k for predict).
+            weighted (bool): distance-weighted vote instead of plain majority.
+            scaler (Standardizer): if given, updated by add() and its
+                per-feature scales applied to every distance.
+        """
+        self.dims = dims
+        self.k = k
+        self.weighted = weighted
+        self.scaler = scaler
+        self.scale = scaler.scale if scaler else array("i", [ONE] * dims)
+        self.X = array("i")
+        self.y = array("H")
+        self.best_d = array("l", [0] * k)
+        self.best_i = array("H", [0] * k)
+        self.votes = array("l")
+
+    def __len__(self):
+        return len(self.y)
+
+    def clear(self):
+        self.X = array("i")
+        self.y = array("H")
+
+    def add(self, x, label):
+        """Add one training point. x is a sequence of dims numbers, label an int >= 0."""
+        for j in range(self.dims):
+            self.X.append(int(x[j]))
+        self.y.append(label)
+        if self.scaler:
+            self.scaler.add(x)
+        while len(self.votes) <= label:
+            self.votes.append(0)
+
+    def nearest(self, q, k=None):
+        """
+        Find the k nearest training points to q. Their squared distances and
+        indices are left in best_d/best_i, nearest first. Returns how many
+        were found (fewer than k if there are fewer training points).
+        """
+        k = self.k if k is None else min(k, self.k)
+        X, bd, bi, dims = self.X, self.best_d, self.best_i, self.dims
+        m = 0
+        sc = self.scale
+        s0 = sc[0]
+        s1 = sc[1] if dims > 1 else 0
+        if dims == 2:
+            qx, qy = int(q[0]), int(q[1])
+        else:
+            q = [int(v) for v in q]
+        o = 0
+        for i in range(len(self.y)):
+            if dims == 2:
+                dx = ((X[o] - qx) * s0) >> SHIFT
+                dy = ((X[o + 1] - qy) * s1) >> SHIFT
+                d = dx * dx + dy * dy
+            else:
+                d = 0
+                for j in range(dims):
+                    t = ((X[o + j] - q[j]) * sc[j]) >> SHIFT
+                    d += t * t
+            o += dims
+            if m < k:
+                j = m
+                m += 1
+            elif d < bd[m - 1]:
+                j = m - 1
+            else:
+                continue
+            # insertion step: shift worse entries down one slot
+            while j > 0 and bd[j - 1] > d:
+                bd[j] = bd[j - 1]
+                bi[j] = bi[j - 1]
+                j -= 1
+            bd[j] = d
+            bi[j] = i
+        return m
+
+    def predict(self, q, k=None):
+        """Majority (or distance-weighted) label of the k nearest points.
+        Ties go to the label of the nearer point. Returns None if untrained."""
+        m = self.nearest(q, k)
+        if m == 0:
+            return None
+        votes, y, bd, bi = self.votes, self.y, self.best_d, self.best_i
+        for j in range(m):
+            votes[y[bi[j]]] = 0
+        best = y[bi[0]]
+        for j in range(m):
+            label = y[bi[j]]
+            votes[label] += ((1 << 24) // (bd[j] + 1)) if self.weighted else 1
+            if votes[label] > votes[best]:
+                best = label
+        return best
+
+
+class KDTree(KNN):
+    """
+    KNN with a k-d tree over the same flat arrays, for sub-linear queries.
+
+    Point i is also tree node i: left/right hold child indices (-1 for
+    none) and axis the split feature. add() links the new point in with
+    one walk from the root, so it is cheap enough for the train button.
+    Queries walk the tree with a preallocated stack and skip any subtree
+    whose splitting plane is already farther than the k-th best point.
+
+    Inserting in sorted order makes the tree deep; rebalance() rebuilds it
+    around medians when the depth gets well past log2(n).
+    """
+
+    def __init__(self, dims=2, k=3, weighted=False, scaler=None):
+        super().__init__(dims, k, weighted, scaler)
+        self.clear()
+
+    def clear(self):
+        super().clear()
+        self.left = array("i")
+        self.right = array("i")
+        self.axis = array("B")
+        self.root = -1
+        self.depth = 0
+        self.stack_n = array("i", [0] * 4)
+        self.stack_b = array("l", [0] * 4)
+
+    def add(self, x, label):
+        super().add(x, label)
+        self._link(len(self.y) - 1)
+
+    def _link(self, i):
+        X, dims = self.X, self.dims
+        if len(self.left) <= i:
+            self.left.append(-1)
+            self.right.append(-1)
+            self.axis.append(0)
+        else:
+            self.left[i] = self.right[i] = -1
+        depth = 0
+        node = self.root
+        parent = -1
+        go_left = False
+        while node >= 0:
+            parent = node
+            a = self.axis[node]
+            go_left = X[i * dims + a] < X[node * dims + a]
+            node = self.left[node] if go_left else self.right[node]
+            depth += 1
+        self.axis[i] = depth % dims
+        if parent < 0:
+            self.root = i
+        elif go_left:
+            self.left[parent] = i
+        else:
+            self.right[parent] = i
+        if depth > self.depth:
+            self.depth = depth
+            while len(self.stack_n) < depth + 2:
+                self.stack_n.append(0)
+                self.stack_b.append(0)
+
+    def rebalance(self, slack=2):
+        """Rebuild around medians if depth > slack * log2(n) + 1. Allocates,
+        so call it from the main loop, not an interrupt handler."""
+        n = len(self.y)
+        log2 = 0
+        while (1 << log2) < n + 1:
+            log2 += 1
+        if self.depth <= slack * log2 + 1:
+            return False
+        X, dims = self.X, self.dims
+        idx = list(range(n))
+        order = []
+        todo = [(0, n, 0)]
+        while todo:
+            lo, hi, d = todo.pop()
+            if lo >= hi:
+                continue
+            a = d % dims
+            part = sorted(idx[lo:hi], key=lambda i: X[i * dims + a])
+            idx[lo:hi] = part
+            mid = (lo + hi) // 2
+            order.append(idx[mid])
+            todo.append((mid + 1, hi, d + 1))
+            todo.append((lo, mid, d + 1))
+        self.root = -1
+        self.depth = 0
+        for i in order:
+            self._link(i)
+        return True
+
+    def nearest(self, q, k=None):
+        k = self.k if k is None else min(k, self.k)
+        X, bd, bi, dims = self.X, self.best_d, self.best_i, self.dims
+        left, right, axis = self.left, self.right, self.axis
+        sn, sb = self.stack_n, self.stack_b
+        sc = self.scale
+        s0 = sc[0]
+        s1 = sc[1] if dims > 1 else 0
+        if dims == 2:
+            qx, qy = int(q[0]), int(q[1])
+        else:
+            q = [int(v) for v in q]
+        m = 0
+        sp = 0
+        if self.root >= 0:
+            sn[0] = self.root
+            sb[0] = 0
+            sp = 1
+        while sp:
+            sp -= 1
+            node = sn[sp]
+            bound = sb[sp]
+            if m == k and bound >= bd[m - 1]:
+                continue            # everything down here is too far
+            o = node * dims
+            if dims == 2:
+                dx = ((X[o] - qx) * s0) >> SHIFT
+                dy = ((X[o + 1] - qy) * s1) >> SHIFT
+                d = dx * dx + dy * dy
+            else:
+                d = 0
+                for j in range(dims):
+                    t = ((X[o + j] - q[j]) * sc[j]) >> SHIFT
+                    d += t * t
+            if m < k or d < bd[m - 1]:
+                if m < k:
+                    j = m
+                    m += 1
+                else:
+                    j = m - 1
+                while j > 0 and bd[j - 1] > d:
+                    bd[j] = bd[j - 1]
+                    bi[j] = bi[j - 1]
+                    j -= 1
+                bd[j] = d
+                bi[j] = node
+            a = axis[node]
+            # same operand order as the distance terms above: the shift
+            # floors, so any far-side point's term is at least |diff|
+            if dims == 2:
+                diff = (X[o] - qx) if a == 0 else (X[o + 1] - qy)
+            else:
+                diff = X[o + a] - q[a]
+            near_left = diff > 0
+            diff = (diff * sc[a]) >> SHIFT
+            if near_left:
+                near, far = left[node], right[node]
+            else:
+                near, far = right[node], left[node]
+            # far side first so the near side is popped (searched) next
+            if far >= 0:
+                sn[sp] = far
+                sb[sp] = max(bound, diff * diff)
+                sp += 1
+            if near >= 0:
+                sn[sp] = near
+                sb[sp] = bound
+                sp += 1
+        return m
+
+
+class SortedKNN1D:
+    """
+    KNN on a single feature, for the one-axis classifiers.
+
+    Samples are kept sorted in an array (as integers, value * scale) with
+    a parallel array of label indices. add() finds its slot by bisection
+    and shifts the tail up one place. A query bisects to the insertion
+    point and walks outward, taking whichever neighbour is closer, until
+    it has k: O(log n + k) and no allocation.
+
+    Labels can be any values (e.g. "forward"); they are stored as indices
+    into the labels tuple given here.
+    """
+
+    def __init__(self, labels, k=3, scale=1000):
+        self.labels = tuple(labels)
+        self.k = k
+        self.scale = scale
+        self.x = array("i")
+        self.y = array("H")
+        self.counts = array("H", [0] * len(self.labels))
+        self.votes = array("H", [0] * len(self.labels))
+
+    def __len__(self):
+        return len(self.x)
+
+    def count(self, label):
+        """Number of samples recorded for label."""
+        return self.counts[self.labels.index(label)]
+
+    def _bisect(self, v):
+        x = self.x
+        lo, hi = 0, len(x)
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if x[mid] < v:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def add(self, value, label):
+        li = self.labels.index(label)
+        v = int(value * self.scale)
+        x, y = self.x, self.y
+        i = self._bisect(v)
+        x.append(v)
+        y.append(li)
+        j = len(x) - 1
+        while j > i:
+            x[j] = x[j - 1]
+            y[j] = y[j - 1]
+            j -= 1
+        x[i] = v
+        y[i] = li
+        self.counts[li] += 1
+
+    def predict(self, value, k=None):
+        """Majority label of the k nearest samples, ties to the nearer one.
+        Returns None if there are no samples."""
+        n = len(self.x)
+        if n == 0:
+            return None
+        k = min(self.k if k is None else k, n)
+        v = int(value * self.scale)
+        x, y, votes = self.x, self.y, self.votes
+        hi = self._bisect(v)
+        lo = hi - 1
+        for j in range(len(votes)):
+            votes[j] = 0
+        best = -1
+        for _ in range(k):
+            if hi >= n or (lo >= 0 and v - x[lo] <= x[hi] - v):
+                li = y[lo]
+                lo -= 1
+            else:
+                li = y[hi]
+                hi += 1
+            votes[li] += 1
+            if best < 0 or votes[li] > votes[best]:
+                best = li
+        return self.labels[best]
+
+
+QMAX = 8191             # quantised features stay within +-QMAX (see QuantizedKNN)
+
+if sys.implementation.name == "micropython":
+    import micropython
+
+    @micropython.viper
+    def _nearest_viper(c0: ptr16, c1: ptr16, c2: ptr16, dims: int, n: int,
+                       q: ptr32, bd: ptr32, bi: ptr32, k: int) -> int:
+        # same search as QuantizedKNN._nearest_py on native machine ints:
+        # no objects are created, so a query never triggers a collection
+        q0 = int(q[0])
+        q1 = int(q[1])
+        q2 = int(q[2])
+        m = 0
+        i = 0
+        while i < n:
+            t = ((int(c0[i]) ^ 0x8000) - 0x8000) - q0    # ptr16 loads are unsigned
+            d = t * t
+            if dims > 1:
+                t = ((int(c1[i]) ^ 0x8000) - 0x8000) - q1
+                d += t * t
+            if dims > 2:
+                t = ((int(c2[i]) ^ 0x8000) - 0x8000) - q2
+                d += t * t
+            j = 0
+            if m < k:
+                j = m
+                m += 1
+            elif d < bd[m - 1]:
+                j = m - 1
+            else:
+                i += 1
+                continue
+            while j > 0 and bd[j - 1] > d:
+                bd[j] = bd[j - 1]
+                bi[j] = bi[j - 1]
+                j -= 1
+            bd[j] = d
+            bi[j] = i
+            i += 1
+        return m
+else:
+    _nearest_viper = None
+
+
+class QuantizedKNN(KNN):
+    """
+    A KNN whose features are quantised once, at train time, into one
+    array('h') column per feature, so a query is pure small-int work.
+
+    Built from a trained KNN/KDTree: each feature is centred on the middle
+    of its training range and multiplied by the model's scale (1/std with
+    a Standardizer), then all features by one common ratio so the widest
+    spans +-QMAX/2; a common ratio keeps the distance ordering, and QMAX
+    keeps a squared 3-feature distance inside a 31-bit int. Queries and
+    later add()s are quantised with these frozen factors (values beyond
+    +-QMAX are clamped).
+
+    With up to 3 features on MicroPython the scan runs in a viper kernel
+    that allocates nothing; otherwise the plain Python loop is used.
+    """
+
+    def __init__(self, model, use_viper=True):
+        dims = model.dims
+        super().__init__(dims, model.k, model.weighted)
+        X, n = model.X, len(model)
+        self.center = array("i", [0] * dims)
+        self.factor = array("i", model.scale)
+        span = 0
+        for j in range(dims):
+            if n:
+                col = [X[i * dims + j] for i in range(n)]
+                lo, hi = min(col), max(col)
+                self.center[j] = (lo + hi) // 2
+                half = ((hi - self.center[j]) * self.factor[j]) >> SHIFT
+                if half > span:
+                    span = half
+        if span:
+            for j in range(dims):
+                self.factor[j] = max(1, self.factor[j] * (QMAX // 2) // span)
+        self.cols = [array("h") for _ in range(dims)]
+        self.best_d = array("i", [0] * self.k)       # 32-bit for the viper kernel
+        self.best_i = array("i", [0] * self.k)
+        self.qbuf = array("i", [0] * max(3, dims))
+        self.viper = use_viper and _nearest_viper is not None and dims <= 3
+        for i in range(n):
+            self.add(X[i * dims:(i + 1) * dims], model.y[i])
+
+    def clear(self):
+        self.cols = [array("h") for _ in range(self.dims)]
+        self.y = array("H")
+
+    def quantize(self, x, out):
+        """Quantised copy of the raw features x into out. Returns out."""
+        for j in range(self.dims):
+            v = ((int(x[j]) - self.center[j]) * self.factor[j]) >> SHIFT
+            out[j] = QMAX if v > QMAX else -QMAX if v < -QMAX else v
+        return out
+
+    def add(self, x, label):
+        qb = self.quantize(x, self.qbuf)
+        for j in range(self.dims):
+            self.cols[j].append(qb[j])
+        self.y.append(label)
+        while len(self.votes) <= label:
+            self.votes.append(0)
+
+    def nearest(self, q, k=None):
+        k = self.k if k is None else min(k, self.k)
+        qb = self.quantize(q, self.qbuf)
+        n = len(self.y)
+        if self.viper:
+            c = self.cols
+            c0 = c[0]
+            c1 = c[1] if self.dims > 1 else c0
+            c2 = c[2] if self.dims > 2 else c0
+            return _nearest_viper(c0, c1, c2, self.dims, n, qb, self.best_d, self.best_i, k)
+        return self._nearest_py(qb, n, k)
+
+    def _nearest_py(self, qb, n, k):
+        bd, bi, dims, cols = self.best_d, self.best_i, self.dims, self.cols
+        m = 0
+        if dims == 2:
+            cx, cy = cols
+            qx, qy = qb[0], qb[1]
+        for i in range(n):
+            if dims == 2:
+                dx = cx[i] - qx
+                dy = cy[i] - qy
+                d = dx * dx + dy * dy
+            else:
+                d = 0
+                for j in range(dims):
+                    t = cols[j][i] - qb[j]
+                    d += t * t
+            if m < k:
+                j = m
+                m += 1
+            elif d < bd[m - 1]:
+                j = m - 1
+            else:
+                continue
+            while j > 0 and bd[j - 1] > d:
+                bd[j] = bd[j - 1]
+                bi[j] = bi[j - 1]
+                j -= 1
+            bd[j] = d
+            bi[j] = i
+        return m
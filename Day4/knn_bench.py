@@ -0,0 +1,90 @@
+"""
+KNN query benchmark (run with CPython on the host).
+
+Compares the original KNN_demo search (sqrt per point, [dist, index] list,
+full sort, max() of the k classes) with Day4/knn.KNN (squared integer
+distances, bounded k-best insertion, majority / weighted vote) and
+knn.KDTree (same, over a k-d tree) and knn.QuantizedKNN (linear scan on
+int16 columns; the viper kernel only exists on the board, so this times
+the Python fallback) on random three-class data of growing size.
+
+    python Day4/knn_bench.py
+"""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Day4.knn import KNN, KDTree, QuantizedKNN
+
+SIZES = (12, 100, 500, 1000, 2000, 5000)
+QUERIES = 200
+K = 3
+CENTRES = {1: (10, 10), 2: (90, 50), 3: (45, 190)}   # roughly the demo's clusters
+
+
+def make_data(n, rng):
+    data = []
+    for i in range(n):
+        label = i % 3 + 1
+        cx, cy = CENTRES[label]
+        data.append([int(rng.gauss(cx, 25)), int(rng.gauss(cy, 40)), label])
+    return data
+
+
+def original_knn(data, x, y, k):
+    distances = []
+    for i in range(len(data)):
+        dist = math.sqrt((data[i][0] - x) ** 2 + (data[i][1] - y) ** 2)
+        distances.append([dist, i])
+    distances.sort()
+    classes = [data[distances[j][1]][2] for j in range(k)]
+    return max(classes)
+
+
+def majority_knn(data, x, y, k):
+    """Reference: full sort, then a true majority vote (ties to the nearest)."""
+    order = sorted(range(len(data)), key=lambda i: (data[i][0] - x) ** 2 + (data[i][1] - y) ** 2)
+    labels = [data[i][2] for i in order[:k]]
+    return max(labels, key=lambda l: (labels.count(l), -labels.index(l)))
+
+
+def per_query_us(fn, queries):
+    t0 = time.perf_counter()
+    out = [fn(qx, qy) for qx, qy in queries]
+    return (time.perf_counter() - t0) * 1e6 / len(queries), out
+
+
+def main():
+    rng = random.Random(35)
+    print("%6s %10s %10s %12s %10s %10s %10s %10s %7s" % ("n", "orig us", "KNN us", "weighted us", "fixed us",
+                                                       "kd us", "kd add us", "speedup", "agree"))
+    for n in SIZES:
+        data = make_data(n, rng)
+        queries = [(rng.randint(-40, 140), rng.randint(-60, 260)) for _ in range(QUERIES)]
+        model = KNN(dims=2, k=K)
+        weighted = KNN(dims=2, k=K, weighted=True)
+        tree = KDTree(dims=2, k=K)
+        for x, y, label in data:
+            model.add((x, y), label)
+            weighted.add((x, y), label)
+        t0 = time.perf_counter()
+        for x, y, label in data:
+            tree.add((x, y), label)
+        t_add = (time.perf_counter() - t0) * 1e6 / n
+        t_orig, _ = per_query_us(lambda x, y: original_knn(data, x, y, K), queries)
+        t_knn, got = per_query_us(lambda x, y: model.predict((x, y)), queries)
+        t_w, _ = per_query_us(lambda x, y: weighted.predict((x, y)), queries)
+        fixed = QuantizedKNN(model)
+        t_q, _ = per_query_us(lambda x, y: fixed.predict((x, y)), queries)
+        t_kd, got_kd = per_query_us(lambda x, y: tree.predict((x, y)), queries)
+        ref = [majority_knn(data, x, y, K) for x, y in queries]
+        agree = sum(a == b == c for a, b, c in zip(got, got_kd, ref)) * 100 / len(ref)
+        print("%6d %10.1f %10.1f %12.1f %10.1f %10.1f %10.1f %9.1fx %6.1f%%"
+              % (n, t_orig, t_knn, t_w, t_q, t_kd, t_add, t_orig / t_kd, agree))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,10 @@ from machine import Pin, PWM
 import time
 import math
 from Day3 import lis3dh
+from Day4.knn import SortedKNN1D
+from Day4 import modelstore
+from Day4.capture import Capture
+from scheduler import FixedRateScheduler
 
 # ---------------- Motor with Encoder -----------------
 class Count:
@@ -40,47 +44,49 @@ class Motor:
             self.M1.duty_u16(0)
             self.M2.duty_u16(duty)
 
-# ---------------- KNN Helper -----------------
-def knn_predict(data, x, k=3):
-    """data = [(value, label), ...]"""
-    # sort by distance to x
-    dists = sorted(data, key=lambda p: abs(p[0] - x))
-    k_nearest = [label for _, label in dists[:k]]
-    # majority vote
-    return max(set(k_nearest), key=k_nearest.count)
-
 # ---------------- Setup -----------------
 motor = Motor(14, 27, 32, 39)
 accel = lis3dh.H3LIS331DL(sda_pin=21, scl_pin=22)
 
 STATE_TRAIN = True
 order = ["forward", "stop", "back"]   # training sequence
-samples = []                           # list of (x, label)
+MODEL_FILE = "mltrain.mdl"             # delete it to train from scratch
 current_label_index = 0
+save_pending = False
+
+try:
+    model, _ = modelstore.load(MODEL_FILE)
+    if model.labels != tuple(order):
+        raise ValueError("labels changed")
+    while current_label_index < len(order) and model.count(order[current_label_index]) >= 10:
+        current_label_index += 1
+    print("Loaded", len(model), "samples from", MODEL_FILE)
+except (OSError, ValueError):
+    model = SortedKNN1D(order, k=3)    # x samples kept sorted, in milli-g
 
 last_time = 0
 debounce = 150
 
-def trainButton(pin):
-    """Press to record a training point for current label"""
-    global current_label_index, last_time, samples
-    if time.ticks_ms() - last_time < debounce:
-        return
-    last_time = time.ticks_ms()
+def trainButton(t):
+    """Record a training point for the current label. Runs from the
+    capture worker after a press, not in the interrupt handler."""
+    global current_label_index, save_pending
 
     if current_label_index < len(order):
         label = order[current_label_index]
         xg = accel.read_accl_g()['x']
-        samples.append((xg, label))
+        model.add(xg, label)
         print(f"Sample {label}: {xg:.3f} g")
 
         # Take, say, 10 samples per class before moving to next label
-        if sum(1 for _, l in samples if l == label) >= 10:
+        if model.count(label) >= 10:
             current_label_index += 1
             if current_label_index < len(order):
                 print(f"Now training {order[current_label_index]}")
             else:
                 print("All classes recorded.")
+                train.report()
+                save_pending = True
     else:
         print("Training complete—switch to Play mode.")
 
@@ -96,17 +102,18 @@ def playButton(pin):
     else:
         print("Finish training all classes first.")
 
-Pin(35, Pin.IN, Pin.PULL_UP).irq(trigger=Pin.IRQ_RISING, handler=trainButton)
+train = Capture(Pin(35, Pin.IN, Pin.PULL_UP), trainButton, debounce_ms=debounce)
 Pin(34, Pin.IN, Pin.PULL_UP).irq(trigger=Pin.IRQ_RISING, handler=playButton)
 
 # ---------------- Main Loop -----------------
-while True:
+CONTROL_MS = 50
+
+def control_step(now):
     if STATE_TRAIN:
-        time.sleep(0.1)
-        continue
+        return
 
     xg = accel.read_accl_g()['x']
-    action = knn_predict(samples, xg, k=3)
+    action = model.predict(xg)
 
     if action == "forward":
         motor.start(direction=1, speed=50)
@@ -115,4 +122,18 @@ while True:
     else:  # stop
         motor.stop()
 
-    time.sleep(0.05)
+# A hardware Timer runs control_step every CONTROL_MS, independent of how
+# long the I2C read and KNN take; overruns and jitter are printed on exit.
+sched = FixedRateScheduler(CONTROL_MS, control_step)
+sched.start()
+try:
+    while True:
+        train.poll()
+        if save_pending:                # file I/O stays out of the IRQ handler
+            save_pending = False
+            modelstore.save(MODEL_FILE, model)
+        time.sleep(1)
+finally:
+    sched.stop()
+    motor.stop()
+    sched.report()
@@ -0,0 +1,111 @@
+"""
+Inspect and merge Day4 model files (run with CPython on the host).
+
+Copy model files off the board first, e.g.
+    mpremote cp :knn_demo.mdl .
+then
+    python Day4/model_tool.py inspect knn_demo.mdl
+    python Day4/model_tool.py merge a.mdl b.mdl -o both.mdl
+
+merge joins the training points of models of the same kind and feature
+count. Labels are matched by name (unnamed KNN labels by id), and the
+scaler statistics and k-d tree are rebuilt for the merged points.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Day4 import modelstore
+from Day4.knn import KNN, KDTree, SortedKNN1D, Standardizer
+
+
+def _points(model):
+    """Training points as ([stored integer features], label id) pairs."""
+    if isinstance(model, SortedKNN1D):
+        return [([model.x[i]], model.y[i]) for i in range(len(model))]
+    d = model.dims
+    return [(list(model.X[i * d:(i + 1) * d]), model.y[i]) for i in range(len(model))]
+
+
+def inspect(path):
+    with open(path, "rb") as f:
+        h = modelstore.read_header(f)
+    model, names = modelstore.load(path)
+    print("%s: version %d, %s, %d feature(s), %d points, %d bytes"
+          % (path, h["version"], modelstore.KIND_NAMES.get(h["kind"], "kind %d" % h["kind"]),
+             h["dims"], h["n"], os.path.getsize(path)))
+    pts = _points(model)
+    counts = {}
+    for _, label in pts:
+        counts[label] = counts.get(label, 0) + 1
+    for label in sorted(counts):
+        name = names[label] if label < len(names) else ""
+        print("  label %d %-10s %d points" % (label, name, counts[label]))
+    for j in range(h["dims"]):
+        col = [x[j] for x, _ in pts]
+        if col:
+            unit = " (x%d)" % model.scale if isinstance(model, SortedKNN1D) else ""
+            print("  feature %d: min %d, max %d%s" % (j, min(col), max(col), unit))
+    scaler = getattr(model, "scaler", None)
+    if scaler:
+        for j in range(scaler.dims):
+            print("  scaler %d: mean %.2f, std %.2f, scale %d" % (j, scaler.mean[j], scaler.std(j), scaler.scale[j]))
+    if isinstance(model, KDTree):
+        print("  tree depth %d" % model.depth)
+
+
+def merge(paths, out):
+    models = [modelstore.load(p) for p in paths]
+    first, _ = models[0]
+    one_d = isinstance(first, SortedKNN1D)
+    dims = 1 if one_d else first.dims
+    for (m, _), p in zip(models, paths):
+        if isinstance(m, SortedKNN1D) != one_d or (not one_d and m.dims != dims):
+            sys.exit("%s: different model kind or feature count from %s" % (p, paths[0]))
+    # KNN and KDTree files hold the same points; the tree is rebuilt
+    kind = SortedKNN1D if one_d else KDTree if any(isinstance(m, KDTree) for m, _ in models) else KNN
+    names = []
+    for _, n in models:
+        for name in n:
+            if name not in names:
+                names.append(name)
+    if kind is SortedKNN1D:
+        if any(m.scale != first.scale for m, _ in models):
+            sys.exit("1-D models with different value scales")
+        merged = SortedKNN1D(names, k=first.k, scale=1)     # copy stored ints as they are
+        for m, n in models:
+            for x, label in _points(m):
+                merged.add(x[0], n[label])
+        merged.scale = first.scale
+    else:
+        scaler = Standardizer(dims) if any(m.scaler for m, _ in models) else None
+        merged = kind(dims, first.k, scaler=scaler)
+        for m, n in models:
+            for x, label in _points(m):
+                # map by name when the label is named, otherwise keep the id
+                merged.add(x, names.index(n[label]) if label < len(n) else label)
+        if kind is KDTree:
+            merged.rebalance()
+    modelstore.save(out, merged, names)
+    print("wrote %s: %d points from %d files" % (out, len(merged), len(paths)))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("inspect", help="print the header, labels and feature ranges")
+    p.add_argument("files", nargs="+")
+    p = sub.add_parser("merge", help="join the training points of several files")
+    p.add_argument("files", nargs="+")
+    p.add_argument("-o", "--output", required=True)
+    args = ap.parse_args()
+    if args.cmd == "inspect":
+        for path in args.files:
+            inspect(path)
+    else:
+        merge(args.files, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Model files for the Day4 classifiers
+#
+# Layout (little-endian), version 1:
+#   header  "<4sBBBBHIi"  magic b"MLMD", version, kind, dims, flags,
+#                         number of labels, number of points, value scale
+#   labels  per label: one length byte + UTF-8 name
+#   points  X: int32 * n * dims, then y: uint16 * n (label ids)
+#   scaler  if flags & HAS_SCALER: uint32 count, mean and m2 as float32 * dims
+#   tree    if flags & HAS_TREE: int32 root, uint16 depth, then
+#           left and right int32 * n, axis uint8 * n
+#
+# Every array section is read with a single readinto() and copied straight
+# into an array, so loading does no per-record parsing.
+
+import struct
+from array import array
+from Day4.knn import KNN, KDTree, SortedKNN1D, Standardizer
+
+MAGIC = b"MLMD"
+VERSION = 1
+HEADER = "<4sBBBBHIi"
+HEADER_SIZE = struct.calcsize(HEADER)
+TREE_HDR = "<iH"
+
+KIND_KNN, KIND_KDTREE, KIND_1D = 1, 2, 3
+KIND_NAMES = {KIND_KNN: "knn", KIND_KDTREE: "kdtree", KIND_1D: "sorted-1d"}
+HAS_SCALER, HAS_TREE = 1, 2
+
+try:
+    array("B").frombytes
+
+    def _array(typecode, buf):
+        a = array(typecode)
+        a.frombytes(buf)
+        return a
+except AttributeError:
+    def _array(typecode, buf):
+        return array(typecode, buf)     # MicroPython copies a bytearray's raw bytes
+
+
+def _read(f, n):
+    buf = bytearray(n)
+    if n and f.readinto(buf) != n:
+        raise ValueError("truncated model file")
+    return buf
+
+
+def _read_array(f, typecode, n):
+    return _array(typecode, _read(f, n * struct.calcsize(typecode)))
+
+
+def save(path, model, names=()):
+    """
+    Write a KNN, KDTree or SortedKNN1D to path. names labels the KNN label
+    ids (index = id); a SortedKNN1D always stores its own labels.
+    """
+    flags = 0
+    if isinstance(model, SortedKNN1D):
+        kind, dims, scale = KIND_1D, 1, model.scale
+        X, names = model.x, model.labels
+    else:
+        kind = KIND_KDTREE if isinstance(model, KDTree) else KIND_KNN
+        dims, scale, X = model.dims, 0, model.X
+        if model.scaler:
+            flags |= HAS_SCALER
+        if kind == KIND_KDTREE:
+            flags |= HAS_TREE
+    n = len(model)
+    with open(path, "wb") as f:
+        f.write(struct.pack(HEADER, MAGIC, VERSION, kind, dims, flags, len(names), n, scale))
+        for name in names:
+            b = str(name).encode()
+            f.write(bytes((len(b),)))
+            f.write(b)
+        f.write(X)
+        f.write(model.y)
+        if flags & HAS_SCALER:
+            sc = model.scaler
+            f.write(struct.pack("<I", sc.n))
+            f.write(array("f", sc.mean))
+            f.write(array("f", sc.m2))
+        if flags & HAS_TREE:
+            f.write(struct.pack(TREE_HDR, model.root, model.depth))
+            f.write(model.left)
+            f.write(model.right)
+            f.write(model.axis)
+
+
+def read_header(f):
+    """Header fields as a dict, with the label names. Raises ValueError on
+    a file that is not a model file or has a newer version."""
+    magic, version, kind, dims, flags, n_labels, n, scale = struct.unpack(HEADER, _read(f, HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError("not a model file")
+    if version > VERSION:
+        raise ValueError("model file version %d is newer than %d" % (version, VERSION))
+    names = []
+    for _ in range(n_labels):
+        names.append(_read(f, _read(f, 1)[0]).decode())
+    return {"version": version, "kind": kind, "dims": dims, "flags": flags,
+            "n": n, "scale": scale, "names": tuple(names)}
+
+
+def load(path, k=3):
+    """Returns (model, names), rebuilding the model type that was saved."""
+    with open(path, "rb") as f:
+        h = read_header(f)
+        kind, dims, flags, n, names = h["kind"], h["dims"], h["flags"], h["n"], h["names"]
+        X = _read_array(f, "i", n * dims)
+        y = _read_array(f, "H", n)
+        if kind == KIND_1D:
+            model = SortedKNN1D(names, k=k, scale=h["scale"])
+            model.x, model.y = X, y
+            for li in y:
+                model.counts[li] += 1
+            return model, names
+        scaler = None
+        if flags & HAS_SCALER:
+            scaler = Standardizer(dims)
+            scaler.n = struct.unpack("<I", _read(f, 4))[0]
+            scaler.mean = list(_read_array(f, "f", dims))
+            scaler.m2 = list(_read_array(f, "f", dims))
+            for j in range(dims):
+                scaler.rescale(j)
+        model = (KDTree if kind == KIND_KDTREE else KNN)(dims, k, scaler=scaler)
+        model.X, model.y = X, y
+        top = max(y) if n else -1
+        while len(model.votes) <= top:
+            model.votes.append(0)
+        if kind == KIND_KDTREE:
+            if flags & HAS_TREE:
+                model.root, model.depth = struct.unpack(TREE_HDR, _read(f, struct.calcsize(TREE_HDR)))
+                model.left = _read_array(f, "i", n)
+                model.right = _read_array(f, "i", n)
+                model.axis = _read_array(f, "B", n)
+                model.stack_n = array("i", [0] * (model.depth + 2))
+                model.stack_b = array("l", [0] * (model.depth + 2))
+            else:
+                for i in range(n):
+                    model._link(i)
+                model.rebalance()
+        return model, names
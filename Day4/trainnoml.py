@@ -1,6 +1,9 @@
 from machine import Pin, PWM
 import time
 from Day3 import lis3dh
+from Day4.knn import SortedKNN1D
+from Day4 import modelstore
+from Day4.capture import Capture
 
 # ---------------- Motor with Encoder -----------------
 class Count:
@@ -49,15 +52,36 @@ order = ["forward", "stop", "back"]   # training sequence
 count = 0
 last_time = 0
 debounce = 150
-
-def trainButton(pin):
-    global count, last_time
-    if time.ticks_ms() - last_time < debounce: return
-    last_time = time.ticks_ms()
+MODEL_FILE = "trainnoml.mdl"          # delete it to train from scratch
+save_pending = False
+
+# The references are stored as a 1-D model file with one sample per state
+try:
+    saved, _ = modelstore.load(MODEL_FILE)
+    if saved.labels != tuple(order) or len(saved) != len(order):
+        raise ValueError("states changed")
+    for i in range(len(saved)):
+        refs[order[saved.y[i]]] = saved.x[i] / saved.scale
+    count = len(order)
+    print("Loaded references from", MODEL_FILE)
+except (OSError, ValueError):
+    pass
+
+
+def save_refs():
+    saved = SortedKNN1D(order)
+    for state in order:
+        saved.add(refs[state], state)
+    modelstore.save(MODEL_FILE, saved)
+
+def trainButton(t):
+    # runs from the capture worker after a press, not in the interrupt handler
+    global count, save_pending
     if count < 3:
         refs[order[count]] = accel.read_accl_g()['x']
         print(f"Trained {order[count]}: {refs[order[count]]:.3f} g")
         count += 1
+        save_pending = count == 3
     else:
         print("All three states recorded.")
 
@@ -71,11 +95,15 @@ def playButton(pin):
     else:
         print("Finish training all 3 states first.")
 
-Pin(35, Pin.IN, Pin.PULL_UP).irq(trigger=Pin.IRQ_RISING, handler=trainButton)
+train = Capture(Pin(35, Pin.IN, Pin.PULL_UP), trainButton, debounce_ms=debounce)
 Pin(34, Pin.IN, Pin.PULL_UP).irq(trigger=Pin.IRQ_RISING, handler=playButton)
 
 # ---------------- Main Loop -----------------
 while True:
+    train.poll()
+    if save_pending:
+        save_pending = False
+        save_refs()
     if STATE_TRAIN:
         time.sleep(0.1)
         continue
@@ -0,0 +1,343 @@
+import json
+import math
+from array import array
+
+CAL_FILE = "catapult_cal.json"
+
+
+def _bisect(xs, x):
+    """Index i of the segment xs[i] <= x <= xs[i+1] (clamped to the ends)."""
+    lo, hi = 0, len(xs) - 2
+    while lo < hi:
+        mid = (lo + hi + 1) >> 1
+        if xs[mid] <= x:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class MonotoneMap:
+    """
+    A monotone interpolating map through calibration points, built once.
+
+    Between points it is a Fritsch-Carlson monotone cubic (or straight
+    lines with linear=True), so it never overshoots or turns back between
+    measurements the way a Lagrange fit can. Each segment is stored as
+    cubic coefficients in arrays; lookup() finds the segment by bisection
+    and evaluates it with Horner's rule. inverse() goes the other way
+    (y to x), also by bisection.
+
+    Inputs outside the calibrated range are clamped to the end points;
+    check x against lo/hi first to warn about it.
+    """
+
+    def __init__(self, xs, ys, linear=False):
+        pts = sorted(zip(xs, ys))
+        n = len(pts)
+        if n < 2:
+            raise ValueError("need at least two calibration points")
+        self.xs = array("f", [p[0] for p in pts])
+        self.ys = array("f", [p[1] for p in pts])
+        for i in range(n - 1):
+            if self.xs[i + 1] <= self.xs[i]:
+                raise ValueError("repeated x value %g" % self.xs[i])
+        self.increasing = self.ys[-1] >= self.ys[0]
+        for i in range(n - 1):
+            if (self.ys[i + 1] < self.ys[i]) == self.increasing and self.ys[i + 1] != self.ys[i]:
+                raise ValueError("points are not monotone at x = %g" % self.xs[i + 1])
+        self.lo = self.xs[0]
+        self.hi = self.xs[-1]
+        self.linear = linear
+        self._build(n)
+
+    def _build(self, n):
+        xs, ys = self.xs, self.ys
+        d = [(ys[i + 1] - ys[i]) / (xs[i + 1] - xs[i]) for i in range(n - 1)]
+        if self.linear:
+            m = None
+        else:
+            # Fritsch-Carlson tangents
+            m = [d[0]] + [0.0] * (n - 2) + [d[-1]]
+            for i in range(1, n - 1):
+                if d[i - 1] * d[i] > 0:
+                    m[i] = (d[i - 1] + d[i]) / 2
+            for i in range(n - 1):
+                if d[i] == 0:
+                    m[i] = m[i + 1] = 0.0
+                    continue
+                a = m[i] / d[i]
+                b = m[i + 1] / d[i]
+                s = a * a + b * b
+                if s > 9:
+                    t = 3 / math.sqrt(s)
+                    m[i] = t * a * d[i]
+                    m[i + 1] = t * b * d[i]
+        # y = c0 + c1 u + c2 u^2 + c3 u^3 with u = x - xs[i]
+        self.c0 = array("f", ys[:n - 1])
+        self.c1 = array("f", [0.0] * (n - 1))
+        self.c2 = array("f", [0.0] * (n - 1))
+        self.c3 = array("f", [0.0] * (n - 1))
+        for i in range(n - 1):
+            if m is None:
+                self.c1[i] = d[i]
+                continue
+            h = xs[i + 1] - xs[i]
+            self.c1[i] = m[i]
+            self.c2[i] = (3 * d[i] - 2 * m[i] - m[i + 1]) / h
+            self.c3[i] = (m[i] + m[i + 1] - 2 * d[i]) / (h * h)
+
+    def clamp(self, x):
+        return self.lo if x < self.lo else self.hi if x > self.hi else x
+
+    def _eval(self, i, u):
+        return self.c0[i] + u * (self.c1[i] + u * (self.c2[i] + u * self.c3[i]))
+
+    def lookup(self, x):
+        """y at x (x clamped to [lo, hi])."""
+        x = self.clamp(x)
+        i = _bisect(self.xs, x)
+        return self._eval(i, x - self.xs[i])
+
+    def inverse(self, y, tol=1e-4):
+        """x whose lookup() is y (y clamped to the calibrated y range)."""
+        ys = self.ys
+        lo_y, hi_y = (ys[0], ys[-1]) if self.increasing else (ys[-1], ys[0])
+        y = lo_y if y < lo_y else hi_y if y > hi_y else y
+        # segment by bisection on the (monotone) y values
+        lo, hi = 0, len(ys) - 2
+        while lo < hi:
+            mid = (lo + hi + 1) >> 1
+            if (ys[mid] <= y) == self.increasing:
+                lo = mid
+            else:
+                hi = mid - 1
+        i = lo
+        a, b = 0.0, self.xs[i + 1] - self.xs[i]
+        while b - a > tol:
+            u = (a + b) / 2
+            if (self._eval(i, u) < y) == self.increasing:
+                a = u
+            else:
+                b = u
+        return self.xs[i] + (a + b) / 2
+
+    def points(self):
+        return list(zip(self.xs, self.ys))
+
+
+def _solve(A, b):
+    """Solve A x = b in place (Gaussian elimination, partial pivoting)."""
+    n = len(b)
+    for c in range(n):
+        p = max(range(c, n), key=lambda r: abs(A[r][c]))
+        if abs(A[p][c]) < 1e-12:
+            raise ValueError("singular fit (too few distinct points)")
+        A[c], A[p] = A[p], A[c]
+        b[c], b[p] = b[p], b[c]
+        for r in range(c + 1, n):
+            f = A[r][c] / A[c][c]
+            for k in range(c, n):
+                A[r][k] -= f * A[c][k]
+            b[r] -= f * b[c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (b[r] - sum(A[r][k] * x[k] for k in range(r + 1, n))) / A[r][r]
+    return x
+
+
+class PolyFit:
+    """
+    Least-squares polynomial y = sum(coef[i] * u**i), u = (x - x0) / span.
+
+    x is centred and scaled to about -1..1 so the normal equations stay
+    well conditioned in single-precision floats.
+    """
+
+    def __init__(self, coef, x0=0.0, span=1.0):
+        self.coef = list(coef)
+        self.x0 = x0
+        self.span = span
+
+    @classmethod
+    def fit(cls, xs, ys, degree=2):
+        """Fit to the points; the degree drops if there are too few of them."""
+        n = len(xs)
+        degree = max(0, min(degree, len(set(xs)) - 1))
+        lo, hi = min(xs), max(xs)
+        x0 = (lo + hi) / 2
+        span = (hi - lo) / 2 or 1.0
+        m = degree + 1
+        A = [[0.0] * m for _ in range(m)]
+        b = [0.0] * m
+        for i in range(n):
+            u = (xs[i] - x0) / span
+            p = [u ** k for k in range(m)]
+            for r in range(m):
+                b[r] += p[r] * ys[i]
+                for c in range(m):
+                    A[r][c] += p[r] * p[c]
+        return cls(_solve(A, b), x0, span)
+
+    def features(self, x):
+        u = (x - self.x0) / self.span
+        return [u ** k for k in range(len(self.coef))]
+
+    def __call__(self, x):
+        u = (x - self.x0) / self.span
+        y = 0.0
+        for c in reversed(self.coef):
+            y = y * u + c
+        return y
+
+    def residuals(self, xs, ys):
+        """Measured minus fitted, per point."""
+        return [ys[i] - self(xs[i]) for i in range(len(xs))]
+
+    def monotone(self, lo, hi, steps=64):
+        prev = self(lo)
+        rising = self(hi) >= prev
+        for i in range(1, steps + 1):
+            y = self(lo + (hi - lo) * i / steps)
+            if (y < prev) == rising and y != prev:
+                return False
+            prev = y
+        return True
+
+    def to_dict(self):
+        return {"coef": self.coef, "x0": self.x0, "span": self.span}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["coef"], d["x0"], d["span"])
+
+
+def _inverse(A):
+    n = len(A)
+    cols = [_solve([row[:] for row in A], [1.0 if r == c else 0.0 for r in range(n)]) for c in range(n)]
+    return [[cols[c][r] for c in range(n)] for r in range(n)]
+
+
+class RLS:
+    """
+    Recursive least squares on a PolyFit's coefficients.
+
+    update(x, y) folds one more measured point into the fit in O(terms^2)
+    without refitting. P is the (scaled) inverse of the normal matrix;
+    starting it from the points the fit was made from makes the update
+    equivalent to refitting with the new point added. `forget` < 1 weights
+    older points down by that factor per update, so the fit follows slow
+    changes (string stretch, battery, a worn band).
+    """
+
+    def __init__(self, fit, P, forget=0.97):
+        self.fit = fit
+        self.P = [list(row) for row in P]
+        self.forget = forget
+
+    @classmethod
+    def from_points(cls, fit, xs, forget=0.97, ridge=1e-3):
+        m = len(fit.coef)
+        A = [[ridge if r == c else 0.0 for c in range(m)] for r in range(m)]
+        for x in xs:
+            p = fit.features(x)
+            for r in range(m):
+                for c in range(m):
+                    A[r][c] += p[r] * p[c]
+        return cls(fit, _inverse(A), forget)
+
+    def update(self, x, y):
+        """Add the point (x, y). Returns its error against the fit before the update."""
+        fit, P, lam = self.fit, self.P, self.forget
+        p = fit.features(x)
+        m = len(p)
+        Pp = [sum(P[r][c] * p[c] for c in range(m)) for r in range(m)]
+        denom = lam + sum(p[r] * Pp[r] for r in range(m))
+        k = [v / denom for v in Pp]
+        err = y - fit(x)
+        for r in range(m):
+            fit.coef[r] += k[r] * err
+        for r in range(m):
+            for c in range(m):
+                P[r][c] = (P[r][c] - k[r] * Pp[c]) / lam
+        return err
+
+
+def residual_report(fit, xs, ys):
+    """Print each point against the fit; returns the RMS residual."""
+    res = fit.residuals(xs, ys)
+    print("   x        measured   fitted   residual")
+    for i in range(len(xs)):
+        print("%7.1f %12.1f %9.1f %9.1f" % (xs[i], ys[i], ys[i] - res[i], res[i]))
+    rms = math.sqrt(sum(r * r for r in res) / len(res)) if res else 0.0
+    print("RMS residual %.1f, max %.1f" % (rms, max(abs(r) for r in res) if res else 0.0))
+    return rms
+
+
+def save_calibration(path, points, fit=None, **extra):
+    """
+    Write measured points [(x, y), ...] and the fitted polynomial to a JSON
+    file on flash. Extra keyword values are stored alongside.
+    """
+    d = {"points": [list(p) for p in points]}
+    if fit is not None:
+        d["fit"] = fit.to_dict()
+    d.update(extra)
+    with open(path, "w") as f:
+        json.dump(d, f)
+
+
+def load_calibration(path):
+    """(points, fit or None, the whole dict). Raises OSError if there is no file."""
+    with open(path) as f:
+        d = json.load(f)
+    points = [tuple(p) for p in d.get("points", ())]
+    fit = PolyFit.from_dict(d["fit"]) if "fit" in d else None
+    return points, fit, d
+
+
+def _isotonic(points):
+    """
+    Pool adjacent violators: the points as blocks [sum x, sum y, count] in x
+    order, merged until the block means run one way (the way of the
+    least-squares slope). Measurement scatter cannot make it turn back.
+    """
+    pts = sorted(points)
+    xs = [p[0] for p in pts]
+    ys = [p[1] for p in pts]
+    rising = PolyFit.fit(xs, ys, 1).coef[-1] >= 0 if len(set(xs)) > 1 else True
+    blocks = []
+    for x, y in pts:
+        blocks.append([x, y, 1])
+        while len(blocks) > 1:
+            a, b = blocks[-2], blocks[-1]
+            ma, mb = a[1] / a[2], b[1] / b[2]
+            if (mb > ma if rising else mb < ma) and b[0] / b[2] > a[0] / a[2]:
+                break
+            a[0] += b[0]
+            a[1] += b[1]
+            a[2] += b[2]
+            blocks.pop()
+    return blocks
+
+
+def build_map(points, fit=None, knots=12):
+    """
+    MonotoneMap for lookups. With a fit that is monotone over the measured
+    range the map follows the fit (sampled at `knots` points), which smooths
+    out measurement scatter. Otherwise it goes through the isotonic block
+    means of the points (see _isotonic), or, if those pool into a single
+    block, along a straight least-squares line.
+    """
+    xs = [p[0] for p in points]
+    lo, hi = min(xs), max(xs)
+    if hi == lo:
+        raise ValueError("need measurements at two or more distances")
+    if fit is not None and fit.monotone(lo, hi):
+        kx = [lo + (hi - lo) * i / (knots - 1) for i in range(knots)]
+        return MonotoneMap(kx, [fit(x) for x in kx])
+    blocks = _isotonic(points)
+    if len(blocks) < 2:
+        line = PolyFit.fit(xs, [p[1] for p in points], 1)
+        return MonotoneMap([lo, hi], [line(lo), line(hi)])
+    return MonotoneMap([b[0] / b[2] for b in blocks], [b[1] / b[2] for b in blocks])
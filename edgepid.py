@@ -0,0 +1,103 @@
+try:
+    from time import ticks_diff
+except ImportError:  # CPython host (sim_track.py)
+    def ticks_diff(a, b):
+        return a - b
+
+
+class EdgePID:
+    """
+    PID on the white-channel reading, treated as a continuous error from the
+    black/white midpoint. Mid-grey (sensor half over the tape edge) is zero
+    error; more white is positive, more black is negative, clamped to -1..1.
+    update() returns a steering value in percent.
+    """
+
+    def __init__(self, black, white, kp=60.0, ki=20.0, kd=3.0, limit=100.0, i_limit=1.0):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.limit = limit
+        self.i_limit = i_limit
+        self.set_levels(black, white)
+        self.reset()
+
+    def set_levels(self, black, white):
+        self.mid = (black + white) / 2
+        self.span = max(1, (white - black) / 2)
+
+    def reset(self):
+        self.integral = 0.0
+        self.prev = None
+
+    def error(self, w):
+        e = (w - self.mid) / self.span
+        return -1.0 if e < -1.0 else 1.0 if e > 1.0 else e
+
+    def update(self, w, dt_ms):
+        e = self.error(w)
+        dt = dt_ms / 1000
+        if dt > 0:
+            self.integral += e * dt
+            self.integral = max(-self.i_limit, min(self.i_limit, self.integral))
+            d = 0.0 if self.prev is None else (e - self.prev) / dt
+        else:
+            d = 0.0
+        self.prev = e
+        out = self.kp * e + self.ki * self.integral + self.kd * d
+        return max(-self.limit, min(self.limit, out))
+
+
+class EdgeFollower:
+    """
+    Follows the left edge of the tape with EdgePID. If the sensor reads
+    fully white for longer than lost_ms the original left/right sweep takes
+    over until the edge is seen again.
+
+    step() returns (left %, right %, mode) where a positive speed is forward
+    and mode is 0 while tracking, 2 while coasting on a lost edge and -1/1
+    for the sweep direction.
+    """
+
+    def __init__(self, black, white, base=30, turn=20, sweep_t=2, lost_ms=300, lost_err=0.9, **pid):
+        self.pid = EdgePID(black, white, **pid)
+        self.base = base
+        self.turn = turn
+        self.sweep_t = sweep_t
+        self.lost_ms = lost_ms
+        self.lost_err = lost_err
+        self.last = None
+        self.lost_since = None
+        self.lost_dir = -1          # start sweeping left
+        self.last_flip = 0
+
+    def _steer(self, w, dt):
+        # never reverse the inside wheel: spinning in place loses the edge
+        steer = self.pid.update(w, dt)
+        return max(-self.base, min(self.base, steer))
+
+    def step(self, w, now):
+        dt = 0 if self.last is None else ticks_diff(now, self.last)
+        self.last = now
+        if self.pid.error(w) < self.lost_err:        # edge in view
+            self.lost_since = None
+            self.lost_dir = -1                      # reset to left first next time
+            steer = self._steer(w, dt)
+            return self.base + steer, self.base - steer, 0
+
+        if self.lost_since is None:
+            self.lost_since = now
+            self.last_flip = now
+        if ticks_diff(now, self.lost_since) < self.lost_ms:
+            # keep turning toward the tape on the saturated PID output
+            steer = self._steer(w, dt)
+            return self.base + steer, self.base - steer, 2
+
+        # fallback: sweep, flipping direction every sweep_t seconds
+        self.pid.reset()
+        if ticks_diff(now, self.last_flip) > self.sweep_t * 1000:
+            self.lost_dir *= -1
+            self.last_flip = now
+        if self.lost_dir == -1:   # rotate left
+            return -self.turn, self.turn, -1
+        return self.turn, -self.turn, 1   # rotate right
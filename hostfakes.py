@@ -0,0 +1,459 @@
+"""
+Fake MicroPython modules for running the car scripts under CPython.
+
+Everything shares one virtual Clock, so time.sleep(), uasyncio sleeps and
+ticks_ms() advance simulated time instantly instead of waiting. Used by
+replay.py; the scripts themselves are run unchanged.
+"""
+import heapq
+import struct
+import sys
+import types
+from collections import deque
+
+
+class ReplayDone(BaseException):
+    """Raised by a fake sensor when the recording runs out (not an Exception,
+    so the scripts' own `except Exception` handlers do not swallow it)."""
+
+
+class Clock:
+    """
+    Virtual time. Fake machine.Timer objects fire as time is advanced past
+    their deadlines, and micropython.schedule() callbacks queue here and
+    run once the advance is complete, as they would between bytecodes.
+    """
+
+    def __init__(self, start_us=0):
+        self.now_us = start_us
+        self.timers = []
+        self.pending = deque()
+        self._draining = False
+
+    def advance(self, us):
+        if us > 0:
+            self.advance_to(self.now_us + us)
+
+    def advance_to(self, us):
+        while self.timers:
+            t = min(self.timers, key=lambda t: t.next_us)
+            if t.next_us > us:
+                break
+            self.now_us = max(self.now_us, t.next_us)
+            if t.period_us:
+                t.next_us += t.period_us
+            else:
+                self.timers.remove(t)
+            t.callback(t)
+            self.run_pending()
+        if us > self.now_us:
+            self.now_us = int(us)
+        self.run_pending()
+
+    def next_deadline(self):
+        return min(t.next_us for t in self.timers) if self.timers else None
+
+    def run_pending(self):
+        if self._draining:
+            return
+        self._draining = True
+        try:
+            while self.pending:
+                fn, arg = self.pending.popleft()
+                fn(arg)
+        finally:
+            self._draining = False
+
+
+# ---- time ----
+def make_time(clock):
+    m = types.ModuleType("time")
+    m.ticks_ms = lambda: clock.now_us // 1000
+    m.ticks_us = lambda: clock.now_us
+    m.ticks_cpu = lambda: clock.now_us
+    m.ticks_diff = lambda a, b: a - b
+    m.ticks_add = lambda a, b: a + b
+    m.sleep = lambda s: clock.advance(s * 1000000)
+    m.sleep_ms = lambda ms: clock.advance(ms * 1000)
+    m.sleep_us = lambda us: clock.advance(us)
+    m.time = lambda: clock.now_us / 1000000
+    m.time_ns = lambda: clock.now_us * 1000
+    m.localtime = lambda *a: (2000, 1, 1, 0, 0, 0, 5, 1)
+    return m
+
+
+# ---- machine ----
+def make_machine(clock, pwm_registry):
+    m = types.ModuleType("machine")
+
+    class Pin:
+        IN, OUT, OPEN_DRAIN = 1, 3, 7
+        PULL_UP, PULL_DOWN = 2, 1
+        IRQ_FALLING, IRQ_RISING = 2, 1
+
+        def __init__(self, id, mode=-1, pull=-1, value=None):
+            self.id = id
+            self._value = 1 if pull == Pin.PULL_UP else 0 if value is None else value
+
+        def value(self, v=None):
+            if v is None:
+                return self._value
+            self._value = v
+
+        def on(self):
+            self._value = 1
+
+        def off(self):
+            self._value = 0
+
+        def irq(self, handler=None, trigger=None, hard=False):
+            self.handler = handler
+
+    class PWM:
+        def __init__(self, pin, freq=None, duty_u16=None, duty=None):
+            self.pin = pin.id if isinstance(pin, Pin) else pin
+            self._freq = freq
+            self._duty = duty_u16 or 0
+            pwm_registry[self.pin] = self
+
+        def freq(self, f=None):
+            if f is None:
+                return self._freq
+            self._freq = f
+
+        def duty_u16(self, d=None):
+            if d is None:
+                return self._duty
+            self._duty = int(d)
+
+        def duty(self, d=None):
+            if d is None:
+                return self._duty >> 6
+            self._duty = int(d) << 6
+
+        def deinit(self):
+            self._duty = 0
+
+    class SoftI2C:
+        def __init__(self, scl=None, sda=None, freq=400000, *args, **kwargs):
+            pass
+
+        def scan(self):
+            return list(range(0x08, 0x78))
+
+        def readfrom_mem(self, addr, reg, n):
+            return bytes(n)
+
+        def readfrom_mem_into(self, addr, reg, buf):
+            for i in range(len(buf)):
+                buf[i] = 0
+
+        def writeto_mem(self, addr, reg, buf):
+            pass
+
+    class Timer:
+        PERIODIC, ONE_SHOT = 1, 0
+
+        def __init__(self, id=-1, **kwargs):
+            self.id = id
+            if kwargs:
+                self.init(**kwargs)
+
+        def init(self, mode=1, period=-1, freq=-1, callback=None):
+            self.deinit()
+            if freq > 0:
+                period = 1000 / freq
+            self.callback = callback
+            self.period_us = int(period * 1000) if mode == Timer.PERIODIC else 0
+            self.next_us = clock.now_us + int(period * 1000)
+            if callback is not None:
+                clock.timers.append(self)
+
+        def deinit(self):
+            if self in clock.timers:
+                clock.timers.remove(self)
+
+    m.Pin = Pin
+    m.PWM = PWM
+    m.SoftI2C = SoftI2C
+    m.I2C = SoftI2C
+    m.Timer = Timer
+    m.freq = lambda *a: 240000000
+    m.reset = lambda: None
+    m.disable_irq = lambda: 0
+    m.enable_irq = lambda state=0: None
+    return m
+
+
+# ---- uasyncio (virtual time) ----
+class _Req:
+    def __init__(self, *req):
+        self.req = req
+
+    def __await__(self):
+        yield self.req
+
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+        self.done = False
+        self.result = None
+        self.joiners = []
+
+    def __await__(self):
+        if not self.done:
+            yield ("join", self)
+        return self.result
+
+    def cancel(self):
+        self.done = True
+
+
+class Kernel:
+    """A tiny cooperative scheduler: same API subset as uasyncio, but sleeps
+    only move the shared Clock forward."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.ready = deque()
+        self.sleepers = []
+        self.seq = 0
+
+    def create_task(self, coro):
+        t = Task(coro)
+        self.ready.append(t)
+        return t
+
+    def _sleep(self, t, us):
+        self.seq += 1
+        heapq.heappush(self.sleepers, (self.clock.now_us + int(us), self.seq, t))
+
+    def _wake_due(self):
+        while self.sleepers and self.sleepers[0][0] <= self.clock.now_us:
+            self.ready.append(heapq.heappop(self.sleepers)[2])
+
+    def _step(self, t):
+        if t.done:
+            return
+        try:
+            req = t.coro.send(None)
+        except StopIteration as e:
+            t.done = True
+            t.result = e.value
+            self.ready.extend(t.joiners)
+            return
+        if req is None:
+            self.ready.append(t)
+        elif req[0] == "sleep":
+            self._sleep(t, req[1])
+        elif req[0] == "wait":
+            req[1].waiters.append(t)
+        elif req[0] == "join":
+            req[1].joiners.append(t)
+        # "forever": the task is simply never resumed
+
+    def run(self, coro):
+        main = self.create_task(coro)
+        while not main.done:
+            self._wake_due()
+            if not self.ready:
+                wake = self.sleepers[0][0] if self.sleepers else self.clock.next_deadline()
+                if wake is None:
+                    return None
+                self.clock.advance_to(wake)
+                continue
+            self._step(self.ready.popleft())
+            self.clock.run_pending()
+        return main.result
+
+
+def make_uasyncio(clock):
+    kernel = Kernel(clock)
+    m = types.ModuleType("uasyncio")
+
+    class Event:
+        def __init__(self):
+            self.state = False
+            self.waiters = []
+
+        def set(self):
+            self.state = True
+            kernel.ready.extend(self.waiters)
+            self.waiters = []
+
+        def clear(self):
+            self.state = False
+
+        def is_set(self):
+            return self.state
+
+        async def wait(self):
+            if not self.state:
+                await _Req("wait", self)
+            return True
+
+    class ThreadSafeFlag(Event):
+        async def wait(self):
+            if not self.state:
+                await _Req("wait", self)
+            self.state = False
+
+    class StreamReader:
+        def __init__(self, stream):
+            self.stream = stream
+
+        async def readline(self):
+            await _Req("forever")
+
+        async def read(self, n=-1):
+            await _Req("forever")
+
+    async def sleep(s):
+        await _Req("sleep", s * 1000000)
+
+    async def sleep_ms(ms):
+        await _Req("sleep", ms * 1000)
+
+    async def gather(*aws):
+        return [await a for a in aws]
+
+    m.Event = Event
+    m.ThreadSafeFlag = ThreadSafeFlag
+    m.StreamReader = StreamReader
+    m.sleep = sleep
+    m.sleep_ms = sleep_ms
+    m.gather = gather
+    m.create_task = kernel.create_task
+    m.run = kernel.run
+    m.kernel = kernel
+    return m
+
+
+# ---- small odds and ends ----
+class _Sink:
+    """Stands in for the serial port: swallows text and binary output."""
+
+    def __init__(self):
+        self.buffer = self
+        self.nbytes = 0
+
+    def write(self, data):
+        self.nbytes += len(data)
+        return len(data)
+
+    def read(self, n=-1):
+        return ""
+
+    def readline(self):
+        return ""
+
+    def flush(self):
+        pass
+
+
+def make_sys():
+    m = types.ModuleType("sys")
+    m.stdout = _Sink()
+    m.stdin = _Sink()
+    m.platform = "esp32"
+    m.print_exception = lambda e, f=None: None
+    m.__getattr__ = lambda name: getattr(sys, name)
+    return m
+
+
+def make_select():
+    m = types.ModuleType("select")
+
+    class _Poll:
+        def register(self, *a):
+            pass
+
+        def poll(self, timeout=-1):
+            return []
+
+    m.poll = _Poll
+    m.POLLIN = 1
+    return m
+
+
+def make_micropython(clock):
+    m = types.ModuleType("micropython")
+    m.const = lambda x: x
+    m.schedule = lambda fn, arg: clock.pending.append((fn, arg))
+    m.alloc_emergency_exception_buf = lambda n: None
+    m.native = m.viper = lambda fn: fn
+    m.opt_level = lambda *a: 0
+    m.mem_info = lambda *a: None
+    return m
+
+
+def make_neopixel():
+    m = types.ModuleType("neopixel")
+
+    class NeoPixel(list):
+        def __init__(self, pin, n, *args, **kwargs):
+            super().__init__([(0, 0, 0)] * n)
+
+        def write(self):
+            pass
+
+        def fill(self, c):
+            for i in range(len(self)):
+                self[i] = c
+
+    m.NeoPixel = NeoPixel
+    return m
+
+
+def make_veml6040(clock, source):
+    """A VEML6040 whose readings come from source.next() (see replay.Run)."""
+    m = types.ModuleType("veml6040")
+    m.VEML6040_I2C_ADDR = 0x10
+    m.IT_40MS, m.IT_80MS, m.IT_160MS = 0x00, 0x10, 0x20
+    m.IT_320MS, m.IT_640MS, m.IT_1280MS = 0x30, 0x40, 0x50
+
+    class VEML6040:
+        def __init__(self, i2c, address=0x10):
+            self.i2c = i2c
+
+        def set_integration_time(self, it_value):
+            pass
+
+        def enable_sensor(self):
+            pass
+
+        def disable_sensor(self):
+            pass
+
+        def set_auto_mode(self):
+            pass
+
+        def set_force_mode(self):
+            pass
+
+        def trigger_measurement(self):
+            pass
+
+        def read_rgbw(self):
+            r, g, b, w = source.next()
+            return (r, g, b, w)
+
+        def read_red(self):
+            return source.next()[0]
+
+        def read_green(self):
+            return source.next()[1]
+
+        def read_blue(self):
+            return source.next()[2]
+
+        def read_white(self):
+            return source.next()[3]
+
+    m.VEML6040 = VEML6040
+    return m
+
+
+# MicroPython's u-prefixed aliases of standard modules
+U_ALIASES = {"ustruct": struct, "ujson": __import__("json"), "ubinascii": __import__("binascii")}
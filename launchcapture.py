@@ -0,0 +1,115 @@
+import math
+import time
+from array import array
+from Day3 import lis3dh
+
+# A capture counts as the arm moving once the acceleration differs from
+# the pre-release baseline by more than this (g)
+RELEASE_G = 2.0
+
+
+class LaunchCapture:
+    """
+    High-rate accelerometer capture around the catapult release.
+
+    record(fire) switches the H3LIS331DL (mounted on the arm) to 1000 Hz,
+    samples pre_ms before calling fire() (the servo release) and post_ms
+    after it, then puts the sensor back to its previous rate. Samples go
+    into a preallocated array('h') with a us timestamp each; the loop is
+    paced to period_us and does no allocation.
+
+    Afterwards:
+      peak_g        largest |a| after the release command
+      peak_ms       when it happened, ms after the command
+      release_ms    first sample that moved more than RELEASE_G away from
+                    the pre-release baseline: the arm's release delay after
+                    the servo command (-1 if it never moved)
+      late          samples that started more than one period late
+    """
+
+    def __init__(self, accel, pre_ms=50, post_ms=250, period_us=1000):
+        self.accel = accel
+        self.period_us = period_us
+        self.pre = pre_ms * 1000 // period_us
+        self.n = self.pre + post_ms * 1000 // period_us
+        self.buf = array("h", [0] * (3 * self.n))
+        self.t = array("l", [0] * self.n)      # us since the first sample
+        self.base = [0, 0, 0]
+        self.peak_g = 0.0
+        self.peak_ms = 0.0
+        self.release_ms = -1.0
+        self.late = 0
+        self.captures = 0
+
+    def record(self, fire):
+        accel = self.accel
+        rate = accel.datarate
+        accel.select_datarate(lis3dh.H3LIS331DL_ACCL_DR_1000)
+        accel.select_data_config(lis3dh.H3LIS331DL_ACCL_BDU_NOT_CONT)
+        buf, t, period, pre = self.buf, self.t, self.period_us, self.pre
+        late = 0
+        t0 = time.ticks_us()
+        due = t0
+        try:
+            for i in range(self.n):
+                wait = time.ticks_diff(due, time.ticks_us())
+                if wait > 0:
+                    time.sleep_us(wait)
+                now = time.ticks_us()
+                if time.ticks_diff(now, due) > period:
+                    late += 1
+                    due = now       # do not try to catch up with a burst
+                if i == pre:
+                    fire()
+                accel.read_accl_into(buf, 3 * i)
+                t[i] = time.ticks_diff(now, t0)
+                due = time.ticks_add(due, period)
+        finally:
+            accel.select_datarate(rate)
+            accel.select_data_config()
+        self.late = late
+        self.captures += 1
+        self._analyse()
+
+    def _analyse(self):
+        buf, pre, n = self.buf, self.pre, self.n
+        fs = lis3dh.H3LIS331DL_LSB_PER_G_100G
+        for a in range(3):
+            self.base[a] = sum(buf[3 * i + a] for i in range(pre)) // pre if pre else 0
+        thr = int(RELEASE_G * fs) ** 2
+        t_fire = self.t[pre]
+        peak = 0
+        peak_i = pre
+        release = -1
+        for i in range(pre, n):
+            x, y, z = buf[3 * i], buf[3 * i + 1], buf[3 * i + 2]
+            mag = x * x + y * y + z * z
+            if mag > peak:
+                peak, peak_i = mag, i
+            if release < 0:
+                dx, dy, dz = x - self.base[0], y - self.base[1], z - self.base[2]
+                if dx * dx + dy * dy + dz * dz > thr:
+                    release = i
+        self.peak_g = math.sqrt(peak) / fs
+        self.peak_ms = (self.t[peak_i] - t_fire) / 1000
+        self.release_ms = (self.t[release] - t_fire) / 1000 if release >= 0 else -1.0
+
+    def summary(self):
+        return {"peak_g": round(self.peak_g, 2), "peak_ms": self.peak_ms,
+                "release_ms": self.release_ms, "late": self.late}
+
+    def report(self):
+        if self.release_ms < 0:
+            print("Capture: arm did not move (peak %.1f g)" % self.peak_g)
+        else:
+            print("Capture: released %.1f ms after the servo command, peak %.1f g at %.1f ms"
+                  % (self.release_ms, self.peak_g, self.peak_ms))
+        if self.late:
+            print("  %d of %d samples late (1000 Hz not sustained)" % (self.late, self.n))
+
+    def write_csv(self, path):
+        """Raw samples as t_us,x,y,z for comparing launches on the host."""
+        with open(path, "w") as f:
+            f.write("t_us,x,y,z\n")
+            for i in range(self.n):
+                f.write("%d,%d,%d,%d\n" % (self.t[i], self.buf[3 * i], self.buf[3 * i + 1], self.buf[3 * i + 2]))
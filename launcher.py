@@ -0,0 +1,165 @@
+import sys
+import time
+from winch import DONE, STALLED
+
+# Launch states
+IDLE = 0
+HOLD = 1
+WIND = 2
+SETTLE = 3
+RELEASE = 4
+RESET = 5
+STATE_NAMES = ("idle", "hold", "wind", "settle", "release", "reset")
+
+# State times (ms)
+HOLD_MS = 500       # servo to hold before the first wind
+SETTLE_MS = 300     # winch run-on after the cut
+RELEASE_MS = 500    # servo open, arm fires
+RESET_MS = 500      # servo back to hold before the next wind
+
+
+class Launcher:
+    """
+    Non-blocking catapult launch sequence.
+
+    step(now) is called at a fixed rate (FixedRateScheduler) and moves
+    through hold -> wind -> settle -> release -> reset, one short check per
+    call, so the main loop stays free for input and networking. Targets
+    queue up with add(); when a shot resets and another is queued the
+    winch starts winding it straight away (the servo is already holding),
+    skipping the hold wait.
+
+    A winch stall aborts the shot without releasing. With `capture` set
+    (a LaunchCapture) the release is done inside its high-rate recording;
+    that step then takes the length of the capture window.
+    """
+
+    def __init__(self, winch, move_servo, wind_map, hold_pos=125, release_pos=20, max_queue=8):
+        self.winch = winch
+        self.move_servo = move_servo
+        self.wind_map = wind_map
+        self.hold_pos = hold_pos
+        self.release_pos = release_pos
+        self.max_queue = max_queue
+        self.queue = []         # (counts, label)
+        self.state = IDLE
+        self.t = 0
+        self.label = None
+        self.wound = 0
+        self.on_release = None  # called as on_release(label, counts wound)
+        self.capture = None
+        self.shots = 0
+        self.stalls = 0
+        self.move_servo(hold_pos)
+
+    def add(self, distance):
+        """Queue a shot at a distance (inches). Returns False if the queue is full."""
+        m = self.wind_map
+        if distance < m.lo or distance > m.hi:
+            print("Warning: %g\" is outside the calibrated range (%.0f-%.0f\"), clamped"
+                  % (distance, m.lo, m.hi))
+            distance = m.clamp(distance)
+        return self.add_counts(int(m.lookup(distance) + 0.5), distance)
+
+    def add_counts(self, counts, label=None):
+        if len(self.queue) >= self.max_queue:
+            print("Queue full (%d shots)" % self.max_queue)
+            return False
+        self.queue.append((counts, label))
+        return True
+
+    def cancel(self):
+        """Drop queued shots and stop any wind in progress (no release)."""
+        self.queue = []
+        if self.state in (HOLD, WIND, SETTLE):
+            self.winch.stop()
+            self.winch.finish()
+            self.state = IDLE
+            print("Cancelled")
+
+    def busy(self):
+        return self.state != IDLE or bool(self.queue)
+
+    def _wind_next(self, now):
+        counts, self.label = self.queue.pop(0)
+        print("Winding to %d counts%s" % (counts, "" if self.label is None else " for %.0f\"" % self.label))
+        self.winch.start(counts)
+        self.state = WIND
+        self.t = now
+
+    def _release(self):
+        self.move_servo(self.release_pos)
+
+    def step(self, now):
+        state = self.state
+        if state == IDLE:
+            if self.queue:
+                self.move_servo(self.hold_pos)
+                self.state = HOLD
+                self.t = now
+        elif state == HOLD:
+            if time.ticks_diff(now, self.t) >= HOLD_MS:
+                self._wind_next(now)
+        elif state == WIND:
+            st = self.winch.poll()
+            if st == DONE:
+                self.state = SETTLE
+                self.t = now
+            elif st == STALLED:
+                self.stalls += 1
+                print("Winch stalled at %d counts - shot dropped" % self.winch.finish())
+                self.state = IDLE
+        elif state == SETTLE:
+            if time.ticks_diff(now, self.t) >= SETTLE_MS:
+                self.wound = self.winch.finish()
+                if self.capture:
+                    self.capture.record(self._release)
+                else:
+                    self._release()
+                self.shots += 1
+                print("LAUNCH! (%d counts)" % self.wound)
+                if self.capture:
+                    self.capture.report()
+                if self.on_release:
+                    self.on_release(self.label, self.wound)
+                self.state = RELEASE
+                self.t = now
+        elif state == RELEASE:
+            if time.ticks_diff(now, self.t) >= RELEASE_MS:
+                self.move_servo(self.hold_pos)
+                self.state = RESET
+                self.t = now
+        elif state == RESET:
+            if time.ticks_diff(now, self.t) >= RESET_MS:
+                if self.queue:
+                    self._wind_next(now)    # pre-wind: servo is already holding
+                else:
+                    self.state = IDLE
+
+    def report(self):
+        print("%d shots, %d stalls, %d queued, state %s"
+              % (self.shots, self.stalls, len(self.queue), STATE_NAMES[self.state]))
+
+
+class SerialLines:
+    """Non-blocking line input from the serial REPL (select.poll on stdin)."""
+
+    def __init__(self):
+        import select
+        self.poll = select.poll()
+        self.poll.register(sys.stdin, select.POLLIN)
+        self.buf = ""
+
+    def read(self):
+        """A complete line (without the newline) if one has arrived, else None."""
+        while self.poll.poll(0):
+            c = sys.stdin.read(1)
+            if not c:
+                break
+            if c in ("\r", "\n"):
+                if self.buf:
+                    line, self.buf = self.buf, ""
+                    return line
+            else:
+                self.buf += c
+        return None
@@ -1,6 +1,15 @@
 from machine import SoftI2C, Pin, PWM
+import sys
 import time
-from veml6040 import VEML6040
+import uasyncio as asyncio
+from veml6040 import VEML6040, IT_40MS
+from telemetry import Telemetry
+from edgepid import EdgeFollower
+from threshold import AdaptiveThreshold
+from recorder import Recorder
+from scheduler import FixedRateScheduler
+import stagetime
+from stagetime import stage
 
 # ---- Encoder + Motor classes (unchanged) ----
 class Count:
@@ -31,51 +40,190 @@ class Motor:
         else:
             self.M1.duty_u16(0);    self.M2.duty_u16(duty)
 
+class RateMeter:
+    """Counts loop iterations and reports the achieved rate in Hz."""
+    def __init__(self):
+        self.n = 0
+        self.t0 = time.ticks_ms()
+        self.hz = 0.0
+    def tick(self):
+        self.n += 1
+    def update(self):
+        dt = time.ticks_diff(time.ticks_ms(), self.t0)
+        if dt > 0:
+            self.hz = self.n * 1000 / dt
+        self.n = 0
+        self.t0 = time.ticks_ms()
+        return self.hz
+
 # ---- Motors ----
 left_motor  = Motor(14, 27, 32, 39)
 right_motor = Motor(12, 13, 25, 33)
 
 # ---- Color sensor ----
+# Force mode with a 40 ms integration: one measurement per trigger, and the
+# control period is set just above it so every step gets a fresh sample.
+# (The driver default is auto mode at 1280 ms, where trigger_measurement
+# does nothing.)
 i2c = SoftI2C(scl=Pin(22), sda=Pin(21), freq=100000)
 color = VEML6040(i2c)
+color.set_integration_time(IT_40MS)
+color.set_force_mode()
 print("VEML6040 ready")
 
+RECORD = False   # True records every reading + encoders to run.tlm for replay.py
+if RECORD:
+    color = Recorder(color, (left_motor.enc, right_motor.enc))
+
 # ---- Parameters ----
 BASE    = 30     # forward speed %
-TURN    = 20     # sweep turn speed %
-THRESH  = 14000  # brightness threshold (tune!)
+TURN    = 20     # sweep turn speed % (fallback only)
+BLACK   = 300    # white channel on tape at 40 ms (starting value, tracked online)
+WHITE   = 540    # white channel off tape at 40 ms (starting value, tracked online)
+ADAPT   = 1      # 1 = follow ambient light changes, 0 = fixed BLACK/WHITE
+KP      = 60.0   # edge PID gains, steering % per unit error
+KI      = 20.0
+KD      = 3.0
 SWEEP_T = 2    # seconds per half-sweep
+LOST_MS = 300    # fully white this long before falling back to the sweep
+CONTROL_MS = 45  # fixed control period: 40 ms integration + margin, so every step reads a fresh sample
+TELEM_MS = 100   # telemetry flush period
+TELEM_DECIMATE = 1  # log every Nth control step
+USE_ASYNC = True # False runs the original blocking loop (for rate comparison)
+PARAMS = ("BASE", "TURN", "BLACK", "WHITE", "ADAPT", "KP", "KI", "KD", "SWEEP_T", "LOST_MS")
 
 def brightness():
     color.trigger_measurement()
     _, _, _, w = color.read_rgbw()
     return w
 
-# ---- Main loop with left-right sweep ----
-lost_dir = -1           # start sweeping left
-last_flip = time.ticks_ms()
-
-while True:
-    w = brightness()
-    print("White:", w)
-
-    if w < THRESH:                       # black tape detected
-        left_motor.start(direction=-1, speed=BASE)
-        right_motor.start(direction=-1, speed=BASE)
-        lost_dir = -1                    # reset to left first next time
-    else:                                # lost line → sweep
-        now = time.ticks_ms()
-        # flip sweep direction every SWEEP_T seconds
-        if time.ticks_diff(now, last_flip) > SWEEP_T * 1000:
-            lost_dir *= -1
-            last_flip = now
-
-        if lost_dir == -1:   # rotate left
-            left_motor.start(direction=1,  speed=TURN)
-            right_motor.start(direction=-1, speed=TURN)
-        else:                # rotate right
-            left_motor.start(direction=-1, speed=TURN)
-            right_motor.start(direction=1,  speed=TURN)
-
-    time.sleep(0.05)
+# ---- Line follow decision (one step) ----
+# Steer proportionally to stay on the left edge of the tape; the old
+# left/right sweep only runs after the edge has been lost for LOST_MS.
+follower = EdgeFollower(BLACK, WHITE, base=BASE, turn=TURN, sweep_t=SWEEP_T,
+                        lost_ms=LOST_MS, kp=KP, ki=KI, kd=KD)
+levels = AdaptiveThreshold(BLACK, WHITE)
+
+def apply_params(name=None):
+    global levels
+    follower.base, follower.turn, follower.sweep_t, follower.lost_ms = BASE, TURN, SWEEP_T, LOST_MS
+    follower.pid.kp, follower.pid.ki, follower.pid.kd = KP, KI, KD
+    if name in ("BLACK", "WHITE"):   # reseed the tracked levels
+        follower.pid.set_levels(BLACK, WHITE)
+        levels = AdaptiveThreshold(BLACK, WHITE)
+
+def drive(left, right):
+    """Signed wheel speeds in %, positive = forward (direction=-1 on this car)."""
+    left_motor.start(direction=-1 if left >= 0 else 1, speed=min(abs(left), 100))
+    right_motor.start(direction=-1 if right >= 0 else 1, speed=min(abs(right), 100))
+
+def control_step(w, now):
+    """Returns 0 when tracking, 2 when coasting on a lost edge, ±1 when sweeping."""
+    if ADAPT:
+        levels.update(w)
+        follower.pid.set_levels(levels.black, levels.white)
+    left, right, mode = follower.step(w, now)
+    drive(left, right)
+    return mode
+
+control_rate = RateMeter()
+# one record per control step: time, white level, control_step mode
+tlm = Telemetry("<IHb", ("t_ms", "w", "mode"), capacity=64, decimate=TELEM_DECIMATE)
+
+# ---- Original blocking loop (kept for before/after rate measurement) ----
+def legacy_loop():
+    last_report = time.ticks_ms()
+    while True:
+        with stage("i2c"):
+            w = brightness()
+        with stage("print"):
+            print("White:", w)
+        with stage("control"):
+            control_step(w, time.ticks_ms())
+        control_rate.tick()
+        if time.ticks_diff(time.ticks_ms(), last_report) > 1000:
+            print("Control rate: %.1f Hz" % control_rate.update())
+            last_report = time.ticks_ms()
+        stagetime.poll_serial()
+        with stage("sleep"):
+            time.sleep(0.05)
+
+# ---- Fixed-rate control step (hardware Timer + micropython.schedule) ----
+w = 0
+running = True
+
+def control_tick(now):
+    """Read the sample triggered last period, trigger the next one, steer."""
+    global w
+    with stage("i2c"):
+        w = color.read_white()
+        color.trigger_measurement()
+    if running:
+        with stage("control"):
+            tlm.log(now, w, control_step(w, now))
+    control_rate.tick()
+
+sched = FixedRateScheduler(CONTROL_MS, control_tick)
+
+# ---- uasyncio tasks (telemetry and serial commands) ----
+async def telemetry_task():
+    """Flush queued telemetry frames; replaces the per-iteration print."""
+    n = 0
+    while True:
+        await asyncio.sleep_ms(TELEM_MS)
+        with stage("telemetry"):
+            tlm.flush()
+            if RECORD:
+                color.flush()
+        n += 1
+        if n % 10 == 0:
+            control_rate.update()
+
+async def command_task():
+    """Serial commands: stop, go, rate, stages [reset], set <PARAM> <value>"""
+    global running
+    reader = asyncio.StreamReader(sys.stdin)
+    while True:
+        line = (await reader.readline()).decode().strip()
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "stop":
+            running = False
+            left_motor.stop()
+            right_motor.stop()
+        elif parts[0] == "go":
+            running = True
+        elif parts[0] == "stages":
+            stagetime.report(reset=len(parts) > 1 and parts[1] == "reset")
+        elif parts[0] == "rate":
+            print("Control rate: %.1f Hz, telemetry dropped: %d" % (control_rate.hz, tlm.dropped))
+            sched.report()
+        elif parts[0] == "set" and len(parts) == 3 and parts[1] in PARAMS:
+            try:
+                globals()[parts[1]] = float(parts[2])
+                apply_params(parts[1])
+                print(parts[1], "=", globals()[parts[1]])
+            except ValueError:
+                print("Bad value:", parts[2])
+        else:
+            print("Commands: stop, go, rate, stages [reset], set <%s> <value>" % "|".join(PARAMS))
+
+async def main():
+    color.trigger_measurement()
+    sched.start()
+    asyncio.create_task(command_task())
+    await telemetry_task()
 
+# ---- Main ----
+try:
+    if USE_ASYNC:
+        asyncio.run(main())
+    else:
+        legacy_loop()
+finally:
+    sched.stop()
+    left_motor.stop()
+    right_motor.stop()
+    if RECORD:
+        color.close()
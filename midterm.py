@@ -1,5 +1,6 @@
 from machine import Pin, PWM
 import time
+from scheduler import FixedRateScheduler
 
 # Setup buttons on D34 and D35 (with internal pull-up resistors)
 button_motor = Pin(34, Pin.IN, Pin.PULL_UP)
@@ -39,8 +40,9 @@ time.sleep(0.5)  # Give servo time to reach initial position
 
 print("Ready! Hold D34 to move motor backward, press D35 to move servo")
 
-# Main loop
-while True:
+CONTROL_MS = 50  # button poll period
+
+def control_step(now):
     # Check if motor button (D34) is pressed - move motor backward
     if button_motor.value() == 0:
         start_motor_backward(speed=100)
@@ -52,6 +54,15 @@ while True:
         move_servo(SERVO_PRESSED_POSITION)
     else:
         move_servo(SERVO_START_POSITION)  # Return to starting position when released
-    
-    time.sleep(0.05)  # Small delay for responsive control
 
+# Main loop: a hardware Timer runs control_step every CONTROL_MS; the
+# scheduled steps execute while the main thread sleeps.
+sched = FixedRateScheduler(CONTROL_MS, control_step)
+sched.start()
+try:
+    while True:
+        time.sleep(1)
+finally:
+    sched.stop()
+    stop_motor()
+    sched.report()
@@ -1,12 +1,13 @@
 from machine import Pin, PWM
 import time
+from winch import Winch, STALLED
+from calibration import CAL_FILE, PolyFit, residual_report, save_calibration, load_calibration
 
 # Setup buttons
 button_launch = Pin(34, Pin.IN, Pin.PULL_UP)
 
-# Setup winch motor on D27 and D14
-M1 = PWM(Pin(14), freq=8000, duty_u16=0)
-M2 = PWM(Pin(27), freq=8000, duty_u16=0)
+# Setup winch motor on D27 and D14, encoder on D32 and D39
+winch = Winch(m1=14, m2=27, enc_a=32, enc_b=39, freq=8000)
 
 # Setup servo on Pin 19 (release mechanism)
 servo = PWM(Pin(19), freq=50)
@@ -15,15 +16,6 @@ servo = PWM(Pin(19), freq=50)
 SERVO_HOLD_POSITION = 125
 SERVO_RELEASE_POSITION = 20
 
-def stop_motor():
-    M1.duty_u16(0)
-    M2.duty_u16(0)
-
-def wind_motor(speed=100):
-    duty = int(speed * 65535 / 100)
-    M1.duty_u16(0)
-    M2.duty_u16(duty)
-
 def angle_to_duty(angle):
     min_duty = 1638
     max_duty = 8192
@@ -32,10 +24,11 @@ def angle_to_duty(angle):
 def move_servo(angle):
     servo.duty_u16(angle_to_duty(angle))
 
-def test_launch(wind_time):
-    """Launch with a specific wind time"""
+def test_launch(counts):
+    """Launch after winding a specific number of encoder counts.
+    Returns the counts actually wound, or None if the winch stalled."""
     print(f"\n{'='*50}")
-    print(f"TESTING WIND TIME: {wind_time} seconds")
+    print(f"TESTING WIND: {counts} counts")
     print(f"{'='*50}")
     
     # Step 1: Servo holds
@@ -43,11 +36,11 @@ def test_launch(wind_time):
     time.sleep(0.5)
     
     # Step 2: Wind the motor
-    print(f"Winding for {wind_time}s...")
-    wind_motor(speed=100)
-    time.sleep(wind_time)
-    stop_motor()
-    time.sleep(0.3)
+    print(f"Winding to {counts} counts...")
+    wound, state = winch.wind_to(counts)
+    if state == STALLED:
+        print(f"Winch stalled at {wound} counts - not launching")
+        return None
     
     # Step 3: Release!
     print("LAUNCH!")
@@ -59,6 +52,7 @@ def test_launch(wind_time):
     time.sleep(0.5)
     
     print("Launch complete!")
+    return wound
 
 # Initialize
 move_servo(SERVO_HOLD_POSITION)
@@ -67,46 +61,62 @@ time.sleep(0.5)
 print("\n" + "="*60)
 print("CATAPULT CALIBRATION TOOL")
 print("="*60)
-print("\nThis tool will test different wind times.")
+print("\nThis tool will test different winch encoder counts.")
 print("For each launch:")
 print("  1. Press D34 to launch")
 print("  2. Measure the distance in inches")
-print("  3. Write down: wind_time -> distance")
+print("  3. Type the distance in when asked")
 print("\nYou'll manually reset the catapult between launches.")
 print("="*60)
 
-# Wind times to test (in seconds)
-# Adjust these based on your motor speed
-# Max wind time is 4.2 seconds
-wind_times_to_test = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.2]
+# Wind counts to test (winch encoder counts)
+# Adjust these based on your winch; about 600 counts per second of the
+# old timed winding, so the max (4.2 s) is about 2520 counts
+counts_to_test = [300, 600, 900, 1200, 1500, 1800, 2100, 2400, 2520]
 
 current_test = 0
-total_tests = len(wind_times_to_test)
+total_tests = len(counts_to_test)
 
-print(f"\nReady to test {total_tests} different wind times")
-print(f"Wind times: {wind_times_to_test}")
+print(f"\nReady to test {total_tests} different wind counts")
+print(f"Wind counts: {counts_to_test}")
 print("\nPress D34 when ready for first launch...")
 
-# Store calibration results
+# Fit: wind counts as a polynomial in distance (least squares)
+FIT_DEGREE = 2
+
+# Keep the measurements already in the calibration file and add to them;
+# set to False to start a fresh calibration (e.g. after changing the arm)
+KEEP_OLD_POINTS = False
+
+# Store calibration results (distance, counts), saved to flash after every
+# launch so a reset part way through loses nothing
 calibration_data = []
+if KEEP_OLD_POINTS:
+    try:
+        calibration_data = load_calibration(CAL_FILE)[0]
+        print(f"Keeping {len(calibration_data)} points from {CAL_FILE}")
+    except (OSError, ValueError):
+        pass
 
 while current_test < total_tests:
     if button_launch.value() == 0:
-        wind_time = wind_times_to_test[current_test]
+        counts = counts_to_test[current_test]
         
         # Launch
-        test_launch(wind_time)
+        wound = test_launch(counts)
         
         print(f"\n>>> MEASURE THE DISTANCE NOW <<<")
-        print(f"Wind time: {wind_time}s")
+        print(f"Wind: {wound} counts (target {counts})")
         print(f"Progress: {current_test + 1}/{total_tests}")
         
         # Get distance input from user
-        distance_str = input("Enter distance in inches: ")
+        distance_str = input("Enter distance in inches: ") if wound is not None else ""
         try:
             distance = float(distance_str)
-            calibration_data.append((distance, wind_time))
-            print(f"Recorded: {distance} inches at {wind_time}s wind time")
+            # keyed by the counts actually wound, not the target
+            calibration_data.append((distance, wound))
+            save_calibration(CAL_FILE, calibration_data)
+            print(f"Recorded: {distance} inches at {wound} counts")
         except:
             print("Invalid input! Please enter a number.")
             print("This test will be skipped.")
@@ -114,18 +124,25 @@ while current_test < total_tests:
         current_test += 1
         
         if current_test < total_tests:
-            print(f"\nNext test: {wind_times_to_test[current_test]}s")
+            print(f"\nNext test: {counts_to_test[current_test]} counts")
             print("Reset your catapult, then press D34 for next launch...")
         else:
             print("\n" + "="*60)
             print("CALIBRATION COMPLETE!")
             print("="*60)
-            print("\nYour calibration data:")
-            print("distance_map = {")
-            for distance, wt in sorted(calibration_data):
-                print(f"    {int(distance)}:  ({wt}, 100),   # {distance} inches")
-            print("}")
-            print("\nCopy this into your main launch code!")
+            calibration_data.sort()
+            xs = [d for d, c in calibration_data]
+            ys = [c for d, c in calibration_data]
+            if len(calibration_data) >= 2:
+                fit = PolyFit.fit(xs, ys, FIT_DEGREE)
+                print(f"\nLeast-squares fit, degree {len(fit.coef) - 1} (counts vs inches):")
+                rms = residual_report(fit, xs, ys)
+                if not fit.monotone(xs[0], xs[-1]):
+                    print("Warning: the fit is not monotone; the launcher will use a monotone (pooled) fit of the points")
+                save_calibration(CAL_FILE, calibration_data, fit, rms=rms)
+                print(f"\nSaved to {CAL_FILE}; the launcher loads it at startup.")
+            else:
+                print("\nNot enough measurements to fit (need at least 2).")
         
         # Wait for button release
         while button_launch.value() == 0:
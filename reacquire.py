@@ -0,0 +1,90 @@
+try:
+    from time import ticks_diff
+except ImportError:  # CPython host
+    def ticks_diff(a, b):
+        return a - b
+
+LEFT, RIGHT = -1, 1
+
+
+class Reacquirer:
+    """
+    Plans the search for a lost line and keeps time-to-reacquire statistics.
+
+    Headings are encoder counts (right minus left wheel). The side searched
+    first is, in order of preference:
+      1. opposite to the way the car veered since the line was last found,
+         if the heading drifted by more than drift_min counts;
+      2. otherwise the side the line has recently been found on.
+    arcs() then alternates sides in widening arcs (first_arc, growth x,
+    ... up to max_arc counts either side of the heading at loss).
+    """
+
+    def __init__(self, first_arc=300, growth=2, max_arc=2400, drift_min=60):
+        self.first_arc = first_arc
+        self.growth = growth
+        self.max_arc = max_arc
+        self.drift_min = drift_min
+        self.heading_sign = 1       # learned: +1 if a right turn raises the heading
+        self.score = {LEFT: 0, RIGHT: 0}
+        self.found_heading = 0
+        self.lost_heading = 0
+        self.t_lost = 0
+        self.side = LEFT
+        # statistics
+        self.n = 0
+        self.misses = 0
+        self.first_try = 0
+        self.total_ms = 0
+        self.max_ms = 0
+        self.hits = {LEFT: 0, RIGHT: 0}
+
+    def learn_turn(self, direction, dh):
+        """Record the heading change seen while turning `direction`."""
+        if dh:
+            self.heading_sign = 1 if (dh > 0) == (direction == RIGHT) else -1
+
+    def lost(self, heading, now):
+        """Call when the line is lost. Returns the side to search first."""
+        self.lost_heading = heading
+        self.t_lost = now
+        drift = (heading - self.found_heading) * self.heading_sign
+        if drift > self.drift_min:
+            self.side = LEFT        # veered right, the line is to the left
+        elif drift < -self.drift_min:
+            self.side = RIGHT
+        else:
+            self.side = RIGHT if self.score[RIGHT] > self.score[LEFT] else LEFT
+        return self.side
+
+    def arcs(self):
+        """Yields (direction, target offset in counts from the loss heading)."""
+        arc = self.first_arc
+        while arc <= self.max_arc:
+            yield self.side, self.side * arc
+            yield -self.side, -self.side * arc
+            arc *= self.growth
+
+    def found(self, side, heading, now, attempt):
+        ms = ticks_diff(now, self.t_lost)
+        self.n += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.hits[side] += 1
+        if attempt == 1:
+            self.first_try += 1
+        for s in self.score:
+            self.score[s] = self.score[s] * 3 // 4
+        self.score[side] += 4
+        self.found_heading = heading
+        return ms
+
+    def failed(self, heading):
+        self.misses += 1
+        self.found_heading = heading
+
+    def report(self):
+        avg = self.total_ms // self.n if self.n else 0
+        print("Reacquired %d (first arc %d, L %d / R %d), missed %d, avg %d ms, max %d ms"
+              % (self.n, self.first_try, self.hits[LEFT], self.hits[RIGHT], self.misses, avg, self.max_ms))
@@ -0,0 +1,50 @@
+import time
+from telemetry import Telemetry
+
+# One record per sensor reading. Channels the script did not read are 0.
+FMT = "<IHHHHii"
+NAMES = ("t_ms", "r", "g", "b", "w", "enc_l", "enc_r")
+
+
+class Recorder:
+    """
+    Wraps a VEML6040 and records every reading, with a timestamp and both
+    encoder counts, to a file on flash for replay.py. Drop it in place of
+    the sensor object; everything else is passed through.
+
+        color = Recorder(color, (left_motor.enc, right_motor.enc))
+
+    Call flush() from the loop and close() when the run ends.
+    """
+
+    def __init__(self, sensor, encoders, path="run.tlm", capacity=128):
+        self.sensor = sensor
+        self.encoders = encoders
+        self.file = open(path, "wb")
+        self.tlm = Telemetry(FMT, NAMES, capacity=capacity, stream=self.file)
+
+    def __getattr__(self, name):
+        return getattr(self.sensor, name)
+
+    def _log(self, r, g, b, w):
+        self.tlm.log(time.ticks_ms(), r, g, b, w,
+                     self.encoders[0].value(), self.encoders[1].value())
+
+    def read_rgbw(self):
+        r, g, b, w = self.sensor.read_rgbw()
+        self._log(r, g, b, w)
+        return r, g, b, w
+
+    def read_white(self):
+        w = self.sensor.read_white()
+        self._log(0, 0, 0, w)
+        return w
+
+    def flush(self, max_records=16):
+        return self.tlm.flush(max_records)
+
+    def close(self):
+        while self.tlm.flush(64):
+            pass
+        self.file.close()
+        print("Recorded", self.tlm.seq, "samples,", self.tlm.dropped, "dropped")
@@ -0,0 +1,226 @@
+"""
+Replay a recorded run through the unchanged car scripts (CPython, host side).
+
+Record on the car by setting RECORD = True in linefollow.py or Car Test.py;
+copy run.tlm off the board (mpremote cp :run.tlm .), then
+
+    python replay.py linefollow.py run.tlm
+    python replay.py "Car Test.py" run.tlm --variant BASE=40 --variant TURN=25,SWEEP_TIME=2.0
+
+The script runs against fake machine/time/uasyncio modules (hostfakes.py):
+each sensor read returns the next recorded sample, the encoder counters are
+set from the recording, and time is virtual, so a minute-long run replays
+in well under a second. The motor outputs after every sample are the
+decisions; each variant's decisions are compared with the baseline's.
+
+Replay is open loop: the recorded readings do not change when a variant
+would have steered differently, so decisions far past the first
+divergence say less than the divergence points themselves.
+"""
+import argparse
+import ast
+import builtins
+import os
+import re
+import time as _time
+import types
+
+import hostfakes
+from telemetry_decode import decode
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+MOTORS = {"left": (14, 27), "right": (12, 13)}   # (M1, M2) PWM pins
+
+
+class Run:
+    """One replay of a script over a recording with a set of overrides."""
+
+    def __init__(self, names, rows, motors=MOTORS, verbose=False):
+        self.cols = {n: i for i, n in enumerate(names)}
+        self.rows = rows
+        self.motors = motors
+        self.verbose = verbose
+        self.index = 0
+        self.decisions = []
+        self.pwm = {}
+        self.globals = None
+        self.clock = hostfakes.Clock(rows[0][self.cols["t_ms"]] * 1000 if rows else 0)
+        self.modules = {
+            "machine": hostfakes.make_machine(self.clock, self.pwm),
+            "time": hostfakes.make_time(self.clock),
+            "uasyncio": hostfakes.make_uasyncio(self.clock),
+            "veml6040": hostfakes.make_veml6040(self.clock, self),
+            "micropython": hostfakes.make_micropython(self.clock),
+            "neopixel": hostfakes.make_neopixel(),
+            "select": hostfakes.make_select(),
+            "sys": hostfakes.make_sys(),
+        }
+        self.modules["utime"] = self.modules["time"]
+        self.modules["asyncio"] = self.modules["uasyncio"]
+        self.modules["uselect"] = self.modules["select"]
+        self.modules.update(hostfakes.U_ALIASES)
+        self.builtins = dict(builtins.__dict__)
+        self.builtins["__import__"] = self._import
+        if not verbose:
+            self.builtins["print"] = lambda *a, **k: None
+
+    # ---- sample source for the fake VEML6040 ----
+    def _motor(self, pins):
+        m1, m2 = self.pwm.get(pins[0]), self.pwm.get(pins[1])
+        duty = (m1.duty_u16() if m1 else 0) - (m2.duty_u16() if m2 else 0)
+        return round(duty * 100 / 65535)
+
+    def _decide(self):
+        """The motor state now is the decision taken on the previous sample."""
+        if self.index:
+            t = self.rows[self.index - 1][self.cols["t_ms"]]
+            self.decisions.append((t,) + tuple(self._motor(p) for p in self.motors.values()))
+
+    def next(self):
+        self._decide()
+        if self.index >= len(self.rows):
+            raise hostfakes.ReplayDone()
+        row = self.rows[self.index]
+        self.index += 1
+        self.clock.advance_to(row[self.cols["t_ms"]] * 1000)
+        g = self.globals
+        for name, col in (("left_motor", "enc_l"), ("right_motor", "enc_r")):
+            if col in self.cols and name in g and hasattr(g[name], "enc"):
+                g[name].enc.counter = row[self.cols[col]]
+        return tuple(row[self.cols[c]] if c in self.cols else 0 for c in ("r", "g", "b", "w"))
+
+    # ---- imports: fakes first, then repo modules loaded under the fakes ----
+    def _load(self, name, path, package=False):
+        mod = types.ModuleType(name)
+        mod.__file__ = path
+        if package:
+            mod.__path__ = [path]
+        else:
+            with open(path) as f:
+                src = f.read()
+            mod.__dict__["__builtins__"] = self.builtins
+            self.modules[name] = mod
+            exec(compile(src, path, "exec"), mod.__dict__)
+        self.modules[name] = mod
+        return mod
+
+    def _repo_module(self, name):
+        if name in self.modules:
+            return self.modules[name]
+        parts = name.split(".")
+        path = os.path.join(REPO, *parts)
+        if os.path.isdir(path):
+            return self._load(name, path, package=True)
+        if os.path.isfile(path + ".py"):
+            mod = self._load(name, path + ".py")
+            if len(parts) > 1:
+                setattr(self._repo_module(".".join(parts[:-1])), parts[-1], mod)
+            return mod
+        return None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        mod = self._repo_module(name)
+        if mod is None:
+            return builtins.__import__(name, globals, locals, fromlist, level)
+        if fromlist and hasattr(mod, "__path__"):
+            for sub in fromlist:
+                if not hasattr(mod, sub):
+                    self._repo_module(name + "." + sub)
+        if not fromlist and "." in name:
+            return self._repo_module(name.split(".")[0])
+        return mod
+
+    # ---- run ----
+    def execute(self, script, overrides=None):
+        with open(script) as f:
+            src = apply_overrides(f.read(), overrides or {})
+        self.globals = {"__name__": "__main__", "__file__": script, "__builtins__": self.builtins}
+        t0 = _time.perf_counter()
+        try:
+            exec(compile(src, script, "exec"), self.globals)
+        except hostfakes.ReplayDone:
+            pass
+        self.wall_s = _time.perf_counter() - t0
+        return self.decisions
+
+
+def apply_overrides(src, overrides):
+    """Replace top-level `NAME = value` assignments in the script source."""
+    for name, value in overrides.items():
+        pat = re.compile(r"^%s[ \t]*=[ \t]*[^#\n]*" % re.escape(name), re.M)
+        src, n = pat.subn(lambda m: "%s = %r " % (name, value), src, count=1)
+        if n == 0:
+            raise SystemExit("%s is not a top-level `NAME = value` in the script" % name)
+    return src
+
+
+def parse_overrides(text):
+    out = {}
+    for item in filter(None, (s.strip() for s in text.split(","))):
+        name, _, value = item.partition("=")
+        try:
+            out[name.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            raise SystemExit("bad override %r (want NAME=literal)" % item)
+    return out
+
+
+def diff_spans(base, other):
+    """Runs of consecutive samples whose decisions differ."""
+    spans = []
+    cur = None
+    for i, (a, b) in enumerate(zip(base, other)):
+        if a[1:] != b[1:]:
+            if cur is None:
+                cur = [i, i, a, b]
+            cur[1] = i
+        elif cur is not None:
+            spans.append(cur)
+            cur = None
+    if cur is not None:
+        spans.append(cur)
+    return spans
+
+
+def replay(script, names, rows, overrides=None, verbose=False):
+    run = Run(names, rows, verbose=verbose)
+    run.execute(script, overrides)
+    return run
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("script", help="car script to replay, e.g. linefollow.py")
+    ap.add_argument("recording", help="run.tlm captured with recorder.Recorder")
+    ap.add_argument("--base", default="", help="overrides for the baseline, NAME=value[,NAME=value]")
+    ap.add_argument("--variant", action="append", default=[], help="overrides to compare against the baseline")
+    ap.add_argument("--spans", type=int, default=10, help="divergent spans to list per variant")
+    ap.add_argument("-v", "--verbose", action="store_true", help="show the script's own prints")
+    args = ap.parse_args(argv)
+
+    with open(args.recording, "rb") as f:
+        names, rows, stats = decode(f.read())
+    if not rows:
+        raise SystemExit("no samples in " + args.recording)
+    span_s = (rows[-1][0] - rows[0][0]) / 1000
+    print("%d samples over %.1f s (%d lost while recording)" % (len(rows), span_s, stats["lost"]))
+
+    base = replay(args.script, names, rows, parse_overrides(args.base), args.verbose)
+    runs = [("baseline " + (args.base or "(as written)"), base)]
+    runs += [(v, replay(args.script, names, rows, parse_overrides(v), args.verbose)) for v in args.variant]
+
+    for label, run in runs:
+        rate = len(run.decisions) / run.wall_s if run.wall_s else 0
+        print("%-40s %6d decisions  %9.0f decisions/s" % (label, len(run.decisions), rate))
+
+    for label, run in runs[1:]:
+        spans = diff_spans(base.decisions, run.decisions)
+        n = sum(s[1] - s[0] + 1 for s in spans)
+        print("\n%s: %d of %d decisions differ in %d spans" % (label, n, len(base.decisions), len(spans)))
+        for i0, i1, a, b in spans[:args.spans]:
+            print("  t=%d..%d ms (%d samples)  baseline L/R %s  variant L/R %s"
+                  % (base.decisions[i0][0], base.decisions[i1][0], i1 - i0 + 1, a[1:], b[1:]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import micropython
+import time
+from machine import Timer
+
+
+class FixedRateScheduler:
+    """
+    Runs step(now_ms) at an exact period, paced by a hardware Timer instead
+    of time.sleep() after variable-length work.
+
+    The timer callback only advances the ideal tick time and hands the step
+    to micropython.schedule, so the step itself runs in the main context
+    (I2C, allocation and print are all allowed there). If a tick arrives
+    while the previous step is still queued or running it is skipped and
+    counted as an overrun; ticks never pile up.
+
+    Jitter is how late each step starts relative to its ideal tick, in us.
+    """
+
+    def __init__(self, period_ms, step, timer_id=1):
+        self.period_ms = period_ms
+        self.period_us = period_ms * 1000
+        self.step = step
+        self.timer = Timer(timer_id)
+        self._run_ref = self._run       # bound once: no allocation in the IRQ
+        self.busy = False
+        self.t_ideal = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.runs = 0
+        self.overruns = 0
+        self.jitter_min = 0
+        self.jitter_max = 0
+        self.jitter_sum = 0
+        self.step_max = 0
+
+    def start(self):
+        self.busy = False
+        self.t_ideal = time.ticks_us()
+        self.timer.init(mode=Timer.PERIODIC, period=self.period_ms, callback=self._tick)
+
+    def stop(self):
+        self.timer.deinit()
+
+    def _tick(self, t):
+        self.t_ideal = time.ticks_add(self.t_ideal, self.period_us)
+        if self.busy:
+            self.overruns += 1
+            return
+        self.busy = True
+        try:
+            micropython.schedule(self._run_ref, self.t_ideal)
+        except RuntimeError:            # schedule queue full
+            self.busy = False
+            self.overruns += 1
+
+    def _run(self, t_ideal):
+        t0 = time.ticks_us()
+        jitter = time.ticks_diff(t0, t_ideal)
+        try:
+            self.step(time.ticks_ms())
+        finally:
+            took = time.ticks_diff(time.ticks_us(), t0)
+            if self.runs == 0 or jitter < self.jitter_min:
+                self.jitter_min = jitter
+            if self.runs == 0 or jitter > self.jitter_max:
+                self.jitter_max = jitter
+            self.jitter_sum += jitter
+            if took > self.step_max:
+                self.step_max = took
+            self.runs += 1
+            self.busy = False
+
+    def report(self):
+        mean = self.jitter_sum // self.runs if self.runs else 0
+        print("period %d ms: %d steps, %d overruns, jitter min/mean/max %d/%d/%d us, step max %d us"
+              % (self.period_ms, self.runs, self.overruns, self.jitter_min, mean,
+                 self.jitter_max, self.step_max))
@@ -0,0 +1,150 @@
+"""
+Lap-time benchmark on a simulated track (run with CPython on the host).
+
+A differential-drive car with the VEML6040 mounted ahead of the axle drives
+a closed loop of 19 mm black tape on white. The sensor reads a white-channel
+value blended across the tape edge, with the 40 ms black/white levels from
+Car Test.py. The original threshold+sweep logic of linefollow.py is compared
+with edgepid.EdgeFollower.
+
+    python sim_track.py
+"""
+import math
+
+from edgepid import EdgeFollower
+
+# ---- Car / sensor model (approximate, tune to the real car) ----
+MM_PER_S_AT_100 = 400   # wheel speed at 100 % duty
+WHEEL_BASE = 120        # mm
+SENSOR_AHEAD = 50       # mm in front of the axle
+SPOT_R = 6              # mm, sensor field of view radius
+TAPE_W = 19             # mm
+BLACK, WHITE = 300, 540 # white channel at 40 ms integration
+CONTROL_MS = 43         # control period of the uasyncio loop
+PHYS_MS = 1
+
+
+def make_track(R=600, a=0.25, n=2000):
+    """r = R(1 + a cos 3θ): long sweeping left bends with short right bends."""
+    pts = []
+    for i in range(n):
+        t = 2 * math.pi * i / n
+        r = R * (1 + a * math.cos(3 * t))
+        pts.append((r * math.cos(t), r * math.sin(t)))
+    return pts
+
+
+class Track:
+    def __init__(self, pts):
+        self.pts = pts
+        self.n = len(pts)
+        self.length = sum(math.dist(pts[i], pts[i - 1]) for i in range(self.n))
+        self.step = self.length / self.n
+
+    def nearest(self, x, y, hint, window=60):
+        best_i, best_d = hint, float("inf")
+        for k in range(-window, window + 1):
+            i = (hint + k) % self.n
+            px, py = self.pts[i]
+            d = (px - x) ** 2 + (py - y) ** 2
+            if d < best_d:
+                best_i, best_d = i, d
+        return best_i, math.sqrt(best_d)
+
+    def heading(self, i):
+        (x0, y0), (x1, y1) = self.pts[i], self.pts[(i + 1) % self.n]
+        return math.atan2(y1 - y0, x1 - x0)
+
+
+def white_level(d):
+    """White channel for a sensor spot whose centre is d mm from the tape centre."""
+    cover = (TAPE_W / 2 + SPOT_R - d) / (2 * SPOT_R)
+    cover = 0.0 if cover < 0 else 1.0 if cover > 1 else cover
+    return int(WHITE - (WHITE - BLACK) * cover)
+
+
+class ThresholdSweep:
+    """
+    The original linefollow.py decision: straight on black, sweep otherwise.
+    With reset_flip the sweep timer restarts when the line is lost (the
+    original only restarts it on a flip, so the first half-sweep is cut short).
+    """
+
+    def __init__(self, base=30, turn=20, thresh=440, sweep_t=2, reset_flip=False):
+        self.base, self.turn, self.thresh, self.sweep_t = base, turn, thresh, sweep_t
+        self.reset_flip = reset_flip
+        self.lost_dir = -1
+        self.last_flip = 0
+        self.on_line = True
+
+    def step(self, w, now):
+        if w < self.thresh:
+            self.lost_dir = -1
+            self.on_line = True
+            return self.base, self.base, 0
+        if self.on_line and self.reset_flip:
+            self.last_flip = now
+        self.on_line = False
+        if now - self.last_flip > self.sweep_t * 1000:
+            self.lost_dir *= -1
+            self.last_flip = now
+        if self.lost_dir == -1:
+            return -self.turn, self.turn, -1
+        return self.turn, -self.turn, 1
+
+
+def run_lap(ctrl, track, laps=1, limit_s=300):
+    """Drive until `laps` laps of progress are made. Returns (seconds, stats)."""
+    x, y = track.pts[0]
+    th = track.heading(0)
+    idx = 0
+    progress = 0.0
+    left = right = 0.0
+    t = 0
+    stats = {"tracking": 0, "searching": 0}
+    while t < limit_s * 1000:
+        if t % CONTROL_MS == 0:
+            sx = x + SENSOR_AHEAD * math.cos(th)
+            sy = y + SENSOR_AHEAD * math.sin(th)
+            _, d = track.nearest(sx, sy, idx)
+            left, right, mode = ctrl.step(white_level(d), t)
+            left = max(-100, min(100, left))
+            right = max(-100, min(100, right))
+            stats["tracking" if mode in (0, 2) else "searching"] += 1
+        vl = left * MM_PER_S_AT_100 / 100
+        vr = right * MM_PER_S_AT_100 / 100
+        dt = PHYS_MS / 1000
+        v = (vl + vr) / 2
+        th += (vr - vl) / WHEEL_BASE * dt
+        x += v * math.cos(th) * dt
+        y += v * math.sin(th) * dt
+        new_idx, _ = track.nearest(x, y, idx)
+        delta = (new_idx - idx + track.n // 2) % track.n - track.n // 2
+        progress += delta * track.step
+        idx = new_idx
+        t += PHYS_MS
+        if abs(progress) >= laps * track.length:
+            return t / 1000, stats
+    return None, stats
+
+
+def main():
+    track = Track(make_track())
+    print("Track length: %.0f mm" % track.length)
+    runs = [
+        ("threshold + sweep (BASE=30)", ThresholdSweep(base=30)),
+        ("  ... sweep timer reset on loss", ThresholdSweep(base=30, reset_flip=True)),
+        ("edge PID (base=30)", EdgeFollower(BLACK, WHITE, base=30)),
+        ("edge PID (base=50)", EdgeFollower(BLACK, WHITE, base=50)),
+        ("edge PID (base=70)", EdgeFollower(BLACK, WHITE, base=70, kp=80.0, kd=4.0)),
+    ]
+    for name, ctrl in runs:
+        lap, stats = run_lap(ctrl, track)
+        total = stats["tracking"] + stats["searching"]
+        searching = 100 * stats["searching"] / total if total else 0
+        lap_s = "%.1f s" % lap if lap else "DNF"
+        print("%-30s lap %-8s searching %4.1f%% of steps" % (name, lap_s, searching))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import sys
+import time
+from array import array
+
+# Log-scale buckets with 4 sub-buckets per power of two: 0..7 us are exact,
+# above that each bucket is 1/4 of an octave wide (<= 25 % error on a
+# percentile). 96 buckets reach ~16 s.
+NBUCKETS = 96
+
+_stages = {}
+_poll = None
+
+
+def _bucket(us):
+    if us < 8:
+        return us if us > 0 else 0
+    b = 0
+    while us >= 8:
+        us >>= 1
+        b += 1
+    i = b * 4 + us
+    return i if i < NBUCKETS else NBUCKETS - 1
+
+
+def _upper(i):
+    """Largest value (us) that lands in bucket i."""
+    if i < 8:
+        return i
+    b = i // 4 - 1
+    return ((i % 4 + 5) << b) - 1
+
+
+class Stage:
+    """
+    Times one named stage of a loop. Use as a context manager
+
+        with stage("i2c"):
+            w = color.read_white()
+
+    or call start()/stop() around the code. Timings go into a preallocated
+    histogram, so timing a stage does not allocate.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.hist = array("L", [0] * NBUCKETS)
+        self.n = 0
+        self.max = 0
+        self.t0 = 0
+
+    def start(self):
+        self.t0 = time.ticks_us()
+
+    def stop(self):
+        self.add(time.ticks_diff(time.ticks_us(), self.t0))
+
+    def add(self, us):
+        self.hist[_bucket(us)] += 1
+        self.n += 1
+        if us > self.max:
+            self.max = us
+
+    def __enter__(self):
+        self.t0 = time.ticks_us()
+        return self
+
+    def __exit__(self, *exc):
+        self.add(time.ticks_diff(time.ticks_us(), self.t0))
+
+    def percentile(self, p):
+        """Upper bound (us) of the bucket holding the p-th percentile."""
+        if self.n == 0:
+            return 0
+        want = (self.n * p + 99) // 100
+        seen = 0
+        for i in range(NBUCKETS):
+            seen += self.hist[i]
+            if seen >= want:
+                return min(_upper(i), self.max)
+        return self.max
+
+    def reset(self):
+        for i in range(NBUCKETS):
+            self.hist[i] = 0
+        self.n = 0
+        self.max = 0
+
+
+def stage(name):
+    """Return the Stage registered under name, creating it on first use."""
+    s = _stages.get(name)
+    if s is None:
+        s = _stages[name] = Stage(name)
+    return s
+
+
+def timed(name):
+    """Decorator: time every call of the function as stage `name`."""
+    s = stage(name)
+
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            s.start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                s.stop()
+        return inner
+    return wrap
+
+
+def report(reset=False):
+    print("%-12s %7s %9s %9s %9s" % ("stage", "n", "p50 us", "p99 us", "max us"))
+    for name in sorted(_stages):
+        s = _stages[name]
+        print("%-12s %7d %9d %9d %9d" % (name, s.n, s.percentile(50), s.percentile(99), s.max))
+        if reset:
+            s.reset()
+
+
+def reset():
+    for s in _stages.values():
+        s.reset()
+
+
+def poll_serial(cmd="p"):
+    """
+    Non-blocking check of the serial REPL for a single-character command.
+    Sending `cmd` prints the report; sending "r" prints it and resets.
+    """
+    global _poll
+    if _poll is None:
+        import select
+        _poll = select.poll()
+        _poll.register(sys.stdin, select.POLLIN)
+    if _poll.poll(0):
+        c = sys.stdin.read(1)
+        if c == cmd:
+            report()
+        elif c == "r":
+            report(reset=True)
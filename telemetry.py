@@ -0,0 +1,111 @@
+import struct
+import sys
+
+# Frame layout on the wire: MAGIC (2 bytes) + sequence (uint16) + record.
+# A text header line "#TLM <fmt> <name,name,...>" precedes the frames so the
+# host decoder (telemetry_decode.py) knows how to unpack them.
+MAGIC = b"\xa5\x5a"
+_FRAME_HDR = "<2sH"
+_FRAME_HDR_SIZE = struct.calcsize(_FRAME_HDR)
+
+
+class Telemetry:
+    """
+    Non-blocking binary telemetry logger.
+
+    log() packs one fixed-size record into a preallocated ring buffer and
+    returns immediately. flush() writes at most max_records frames to the
+    stream, so the control loop never waits for the whole backlog. When the
+    ring is full the oldest record is overwritten; flush() counts it in
+    `dropped`.
+
+    log() may run in a micropython.schedule callback (the FixedRateScheduler
+    step) that interrupts flush() in the main/uasyncio context, so the two
+    never write the same field: log() only advances `seq` (records logged),
+    flush() only advances `sent` (records written or dropped). flush()
+    copies frames out of the ring before writing them, then drops any that
+    log() overwrote during the copy. Call log() from one context (e.g. the
+    scheduled control step) and flush() from one other (the main loop or a
+    uasyncio task); neither may be called from a hard interrupt handler.
+    """
+
+    def __init__(self, fmt, names, capacity=64, decimate=1, stream=None):
+        """
+        Args:
+            fmt (str): struct format of one record, e.g. "<IH".
+            names (tuple): field names, one per value in fmt.
+            capacity (int): number of records the ring can hold.
+            decimate (int): keep 1 of every `decimate` calls to log().
+            stream: binary stream to write to (defaults to sys.stdout.buffer).
+        """
+        self.fmt = fmt
+        self.names = names
+        self.frame_size = _FRAME_HDR_SIZE + struct.calcsize(fmt)
+        self.capacity = capacity
+        self.decimate = decimate
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.buf = bytearray(capacity * self.frame_size)
+        self.mv = memoryview(self.buf)
+        self.out = bytearray(0)     # flush() copy, sized on first use
+        self.seq = 0        # records logged (written only by log)
+        self.sent = 0       # records flushed or dropped (written only by flush)
+        self.dropped = 0
+        self._skip = 0
+        self.header_sent = False
+
+    def header(self):
+        return "#TLM %s %s\n" % (self.fmt, ",".join(self.names))
+
+    def log(self, *values):
+        """Queue one record. Cheap enough to call every loop iteration."""
+        self._skip += 1
+        if self._skip < self.decimate:
+            return
+        self._skip = 0
+        seq = self.seq
+        off = (seq % self.capacity) * self.frame_size
+        struct.pack_into(_FRAME_HDR, self.buf, off, MAGIC, seq & 0xFFFF)
+        struct.pack_into(self.fmt, self.buf, off + _FRAME_HDR_SIZE, *values)
+        self.seq = seq + 1      # publish only once the slot is complete
+
+    def flush(self, max_records=8):
+        """Write up to max_records queued frames. Returns how many were written."""
+        if not self.header_sent:
+            self.stream.write(self.header().encode())
+            self.header_sent = True
+        cap, fs = self.capacity, self.frame_size
+        sent = self.sent
+        waiting = self.seq - sent
+        if waiting > cap:               # overwritten before they were sent
+            self.dropped += waiting - cap
+            sent += waiting - cap
+            waiting = cap
+        n = min(waiting, max_records)
+        if n == 0:
+            self.sent = sent
+            return 0
+        if len(self.out) < n * fs:
+            self.out = bytearray(max(n, max_records) * fs)
+        out = self.out
+        tail = sent % cap
+        first = min(n, cap - tail)      # contiguous run before wrapping
+        out[0:first * fs] = self.mv[tail * fs:(tail + first) * fs]
+        if n > first:
+            out[first * fs:n * fs] = self.mv[0:(n - first) * fs]
+        # frames log() overwrote while they were copied may be torn: drop them
+        lapped = min(n, self.seq - cap - sent)
+        if lapped > 0:
+            self.dropped += lapped
+        else:
+            lapped = 0
+        if n > lapped:
+            self.stream.write(memoryview(out)[lapped * fs:n * fs])
+        self.sent = sent + n
+        return n - lapped
+
+    async def run(self, period_ms=100, max_records=8):
+        """uasyncio task: flush in the background every period_ms."""
+        import uasyncio as asyncio
+        while True:
+            self.flush(max_records)
+            await asyncio.sleep_ms(period_ms)
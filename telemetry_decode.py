@@ -0,0 +1,97 @@
+"""
+Host-side decoder for telemetry.py streams (run with CPython, not on the ESP32).
+
+Capture the serial output to a file first, e.g.
+    mpremote run linefollow.py > run.bin
+then
+    python telemetry_decode.py run.bin -o run.csv
+    python telemetry_decode.py run.bin --npy run.npy
+"""
+import argparse
+import csv
+import struct
+import sys
+
+from telemetry import MAGIC, _FRAME_HDR, _FRAME_HDR_SIZE
+
+HEADER_TAG = b"#TLM "
+
+
+def decode(data):
+    """
+    Decode a captured byte stream.
+
+    Returns (names, rows, stats) where rows is a list of tuples and stats
+    counts frames and sequence gaps (records dropped on the device).
+    Text printed between frames is skipped.
+    """
+    names, fmt, size = None, None, 0
+    rows = []
+    stats = {"frames": 0, "lost": 0}
+    last_seq = None
+    i = 0
+    n = len(data)
+    while i < n:
+        if data.startswith(HEADER_TAG, i):
+            end = data.find(b"\n", i)
+            if end < 0:
+                break
+            _, fmt, fields = data[i:end].decode().split(" ", 2)
+            names = tuple(fields.strip().split(","))
+            size = _FRAME_HDR_SIZE + struct.calcsize(fmt)
+            last_seq = None
+            i = end + 1
+            continue
+        if fmt is not None and data.startswith(MAGIC, i) and i + size <= n:
+            _, seq = struct.unpack_from(_FRAME_HDR, data, i)
+            rows.append(struct.unpack_from(fmt, data, i + _FRAME_HDR_SIZE))
+            if last_seq is not None:
+                stats["lost"] += (seq - last_seq - 1) & 0xFFFF
+            last_seq = seq
+            stats["frames"] += 1
+            i += size
+            continue
+        i += 1
+    return names, rows, stats
+
+
+def to_numpy(names, rows):
+    """Rows as a NumPy structured array (requires numpy)."""
+    import numpy as np
+    return np.rec.fromrecords(rows, names=",".join(names))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("capture", help="captured serial output, or - for stdin")
+    ap.add_argument("-o", "--csv", help="write CSV here (default: stdout)")
+    ap.add_argument("--npy", help="write a NumPy structured array here instead of CSV")
+    args = ap.parse_args(argv)
+
+    if args.capture == "-":
+        data = sys.stdin.buffer.read()
+    else:
+        with open(args.capture, "rb") as f:
+            data = f.read()
+
+    names, rows, stats = decode(data)
+    if names is None:
+        sys.exit("no #TLM header found in capture")
+    print("%d frames, %d lost" % (stats["frames"], stats["lost"]), file=sys.stderr)
+
+    if args.npy:
+        import numpy as np
+        np.save(args.npy, to_numpy(names, rows))
+        return
+    out = open(args.csv, "w", newline="") if args.csv else sys.stdout
+    try:
+        w = csv.writer(out)
+        w.writerow(names)
+        w.writerows(rows)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 from machine import Pin, PWM
 import time
+from calibration import CAL_FILE, PolyFit, RLS, build_map, load_calibration, save_calibration
+from winch import Winch
+from launcher import Launcher, SerialLines
+from scheduler import FixedRateScheduler
+from launchcapture import LaunchCapture
 
-# Setup winch motor on D27 and D14
-M1 = PWM(Pin(14), freq=10000, duty_u16=0)
-M2 = PWM(Pin(27), freq=10000, duty_u16=0)
+# Setup winch motor on D27 and D14, encoder on D32 and D39
+winch = Winch(m1=14, m2=27, enc_a=32, enc_b=39)
 
 # Setup servo on Pin 19 (release mechanism)
 servo = PWM(Pin(19), freq=50)
@@ -12,14 +16,85 @@ servo = PWM(Pin(19), freq=50)
 SERVO_HOLD_POSITION = 125
 SERVO_RELEASE_POSITION = 20
 
-def stop_motor():
-    M1.duty_u16(0)
-    M2.duty_u16(0)
+# Winch encoder counts per second at full speed on a charged battery.
+# Only used to convert the old timed calibration and the 's' input mode;
+# launches wind to counts, so they no longer depend on battery voltage.
+COUNTS_PER_S = 600
+
+# Fallback calibration, used when there is no calibration file on flash
+# (midtermcal.py writes one). From actual measurements!
+# distance (inches) -> wind time (s), converted to encoder counts below.
+CALIBRATION = [(d, int(t * COUNTS_PER_S)) for d, t in (
+    (15, 1.0),
+    (35, 1.5),
+    (52, 2.0),
+    (58, 2.34),
+    (62, 2.5),
+    (64, 2.62),
+    (67, 3.0),
+    (75, 3.5),
+    (77, 3.73),
+    (85, 4.0),
+    (86, 4.2),   # max wind
+)]
+
+try:
+    points, fit, cal = load_calibration(CAL_FILE)
+    if len(points) < 2:
+        raise ValueError("too few points")
+    print(f"Loaded {len(points)} calibration points from {CAL_FILE}")
+except (OSError, ValueError, KeyError):
+    points, fit, cal = list(CALIBRATION), None, {}
+    print(f"No {CAL_FILE}: using the built-in calibration")
+
+# Built once at startup: a monotone cubic through the fitted curve (or the
+# points), so a longer target always means a longer wind (the old per-launch
+# quadratic fit could dip between points). Lookups are a bisection plus one
+# cubic.
+try:
+    WIND_MAP = build_map(points, fit)
+except Exception as e:
+    print(f"Warning: calibration in {CAL_FILE} is unusable ({e}): using the built-in calibration")
+    points, fit, cal = list(CALIBRATION), None, {}
+    WIND_MAP = build_map(points, fit)
+MAX_COUNTS = int(max(WIND_MAP.lookup(WIND_MAP.lo), WIND_MAP.lookup(WIND_MAP.hi)))
+
+# ---- Self-correcting calibration ----
+# After a shot, enter how far it actually went ('m 48', or publish 48 to
+# MQTT_TOPIC). The fit is updated by recursive least squares, saved to the
+# calibration file and the map rebuilt, so the next shots use it.
+ADAPTIVE = True
+FORGET = 0.97      # weight kept by older measurements at each update
+FIT_DEGREE = 2
+if fit is None:
+    fit = PolyFit.fit([d for d, c in points], [c for d, c in points], FIT_DEGREE)
+if len(cal.get("P", ())) == len(fit.coef):
+    rls = RLS(fit, cal["P"], FORGET)      # carry on from the last session
+else:
+    rls = RLS.from_points(fit, [d for d, c in points], FORGET)
+shot_log = cal.get("log", [])      # [target, measured, counts(, capture)] per shot
+unmeasured = []                    # (target, counts, capture) of shots fired, oldest first
 
-def wind_motor(speed=100):
-    duty = int(speed * 65535 / 100)
-    M1.duty_u16(0)
-    M2.duty_u16(duty)
+# ---- Launch capture ----
+# The H3LIS331DL on the arm records at 1000 Hz from 50 ms before to 250 ms
+# after each release: peak acceleration and the arm's release delay are
+# printed and kept in the shot log. 'l' turns it off and on.
+CAPTURE = True
+CAPTURE_CSV = None     # e.g. "launch.csv": raw samples of the last launch
+csv_pending = False
+try:
+    from Day3 import lis3dh
+    capture = LaunchCapture(lis3dh.H3LIS331DL(sda_pin=21, scl_pin=22))
+except (OSError, RuntimeError) as e:
+    print(f"No accelerometer ({e}): launch capture off")
+    capture = None
+
+# Optional: measured distances published over MQTT (see MQTT.py)
+USE_MQTT = False
+MQTT_TOPIC = "/ME35/catapult/measured"
+
+def stop_motor():
+    winch.stop()
 
 def angle_to_duty(angle):
     min_duty = 1638
@@ -29,181 +104,213 @@ def angle_to_duty(angle):
 def move_servo(angle):
     servo.duty_u16(angle_to_duty(angle))
 
-def launch_at_time(wind_time):
+def shot_released(target, counts):
+    # called by the launcher (in the scheduled step) as each shot fires
+    global csv_pending
+    summary = None
+    if launcher.capture:
+        summary = capture.summary()
+        if CAPTURE_CSV:
+            # written by the main loop: flash writes do not belong in the step
+            csv_pending = True
+    unmeasured.append((target, counts, summary))
+
+def record_measurement(measured):
     """
-    Launch with a specific wind time in seconds.
+    Pair a measured distance with the oldest shot not yet measured and,
+    in adaptive mode, correct the calibration with it.
     """
-    print(f"\n{'='*50}")
-    print(f"MANUAL MODE: Wind time {wind_time}s")
-    print(f"{'='*50}")
-    
-    # Step 1: Servo holds
-    move_servo(SERVO_HOLD_POSITION)
-    time.sleep(0.5)
-    
-    # Step 2: Wind the motor at full speed
-    print("Winding...")
-    wind_motor(speed=100)
-    time.sleep(wind_time)
-    stop_motor()
-    time.sleep(0.3)
-    
-    # Step 3: LAUNCH!
-    print("🚀 LAUNCH!")
-    move_servo(SERVO_RELEASE_POSITION)
-    time.sleep(0.5)
-    
-    # Step 4: Reset
-    move_servo(SERVO_HOLD_POSITION)
-    time.sleep(0.5)
-    
-    print("Launch complete! Ready for next launch.\n")
+    global WIND_MAP, rls
+    if not unmeasured:
+        print("No launched shot is waiting for a measurement")
+        return
+    target, counts, summary = unmeasured[0]
+    if ADAPTIVE:
+        # update a copy and build its map first: if that fails nothing changes
+        trial = RLS(PolyFit(rls.fit.coef, rls.fit.x0, rls.fit.span), rls.P, rls.forget)
+        err = trial.update(measured, counts)
+        try:
+            new_map = build_map(points + [(measured, counts)], trial.fit)
+        except ValueError as e:
+            print(f"Measurement {measured} not applied, the calibration would break ({e});")
+            print("the shot is still waiting for its measurement")
+            return
+    unmeasured.pop(0)
+    shot_log.append([target, measured, counts] + ([summary] if summary else []))
+    if target is None:
+        print(f"Shot at {counts} counts went {measured} inches")
+    else:
+        print(f"Target {target:.0f}, went {measured} inches ({measured - target:+.1f})")
+    errs = [abs(s[1] - s[0]) for s in shot_log[-5:] if s[0] is not None]
+    if errs:
+        print(f"Mean miss over the last {len(errs)} targeted shots: {sum(errs) / len(errs):.1f} inches")
+    if not ADAPTIVE:
+        return
+    rls = trial
+    points.append((measured, counts))
+    WIND_MAP = new_map
+    launcher.wind_map = WIND_MAP
+    print(f"Calibration corrected (fit was off by {err:+.0f} counts)")
+    try:
+        save_calibration(CAL_FILE, points, rls.fit, P=rls.P, log=shot_log)
+    except OSError as e:
+        print(f"Could not save {CAL_FILE}: {e}")
+
+def connect_mqtt():
+    """Subscribe to MQTT_TOPIC for measured distances. Returns the client or None."""
+    try:
+        import network
+        import secrets
+        from umqtt.simple import MQTTClient
+        wlan = network.WLAN(network.STA_IF)
+        wlan.active(True)
+        if not wlan.isconnected():
+            print("Connecting to WiFi...")
+            wlan.connect(secrets.SSID, secrets.PWD)
+            timeout = 10
+            while not wlan.isconnected() and timeout > 0:
+                time.sleep(1)
+                timeout -= 1
+        client = MQTTClient(
+            client_id = "esp32_catapult",
+            server = secrets.mqtt_url,
+            port = 8883,
+            user = secrets.mqtt_username,
+            password = secrets.mqtt_password,
+            ssl = True,
+            ssl_params = {'server_hostname': secrets.mqtt_url}
+        )
+        client.set_callback(mqtt_message)
+        client.connect()
+        client.subscribe(MQTT_TOPIC)
+        print(f"MQTT: measured distances on {MQTT_TOPIC}")
+        return client
+    except (ImportError, OSError) as e:
+        print(f"MQTT unavailable ({e}): enter measurements over serial")
+        return None
+
+def mqtt_message(topic, msg):
+    try:
+        measured = float(msg)
+    except ValueError:
+        print(f"Ignoring MQTT message {msg}: not a distance")
+        return
+    record_measurement(measured)
 
-def launch_at_distance(distance_inches):
+def parse_command(user_input):
     """
-    Launch ball at a specific distance in inches.
-    Uses calibrated distance-to-wind-time mapping.
+    Queue a shot from one line of input. Returns False to quit.
     """
-    # YOUR CALIBRATION DATA - From actual measurements!
-    distance_map = {
-        15:   1.0,   # 7 inches → 1.0s wind time
-        35:  1.5,   # 22 inches → 1.5s wind time
-        52:  2.0,
-        58:  2.34,# 41 inches → 2.0s wind time
-        62:  2.5,
-        64:  2.62,# 52 inches → 2.5s wind time
-        67:  3.0,   # 67 inches → 3.0s wind time
-        75:  3.5,
-        77:  3.73,
-        85:  4.0,   # 90 inches → 4.0s wind time
-        86:  4.2,   # 91 inches (max) → 4.2s wind time
-    }
-    
-    # Find closest distance in map or interpolate
-    distances = sorted(distance_map.keys())
-    
-    # Check if distance is in range
-    if distance_inches < distances[0]:
-        print(f"Warning: {distance_inches}\" is below minimum range ({distances[0]}\")")
-        print(f"Using minimum distance: {distances[0]}\"")
-        distance_inches = distances[0]
-    elif distance_inches > distances[-1]:
-        print(f"Warning: {distance_inches}\" is above maximum range ({distances[-1]}\")")
-        print(f"Using maximum distance: {distances[-1]}\"")
-        distance_inches = distances[-1]
-    
-    # Get wind time (exact match or interpolate)
-    if distance_inches in distance_map:
-        wind_time = distance_map[distance_inches]
-    else:
-        # Quadratic interpolation (uses 3 nearest points for better accuracy)
-        for i in range(len(distances)-1):
-            if distances[i] <= distance_inches <= distances[i+1]:
-                # Use 3 points for quadratic fit when possible
-                if i > 0:
-                    # Use points [i-1, i, i+1]
-                    d0, d1, d2 = distances[i-1], distances[i], distances[i+1]
-                    t0, t1, t2 = distance_map[d0], distance_map[d1], distance_map[d2]
-                    
-                    # Lagrange quadratic interpolation
-                    x = distance_inches
-                    L0 = ((x - d1) * (x - d2)) / ((d0 - d1) * (d0 - d2))
-                    L1 = ((x - d0) * (x - d2)) / ((d1 - d0) * (d1 - d2))
-                    L2 = ((x - d0) * (x - d1)) / ((d2 - d0) * (d2 - d1))
-                    wind_time = t0 * L0 + t1 * L1 + t2 * L2
-                elif i < len(distances)-2:
-                    # Use points [i, i+1, i+2]
-                    d0, d1, d2 = distances[i], distances[i+1], distances[i+2]
-                    t0, t1, t2 = distance_map[d0], distance_map[d1], distance_map[d2]
-                    
-                    # Lagrange quadratic interpolation
-                    x = distance_inches
-                    L0 = ((x - d1) * (x - d2)) / ((d0 - d1) * (d0 - d2))
-                    L1 = ((x - d0) * (x - d2)) / ((d1 - d0) * (d1 - d2))
-                    L2 = ((x - d0) * (x - d1)) / ((d2 - d0) * (d2 - d1))
-                    wind_time = t0 * L0 + t1 * L1 + t2 * L2
-                else:
-                    # Fall back to linear for endpoints
-                    d1, d2 = distances[i], distances[i+1]
-                    t1, t2 = distance_map[d1], distance_map[d2]
-                    ratio = (distance_inches - d1) / (d2 - d1)
-                    wind_time = t1 + (t2 - t1) * ratio
-                break
-    
-    print(f"\n{'='*50}")
-    print(f"TARGET: {distance_inches} inches")
-    print(f"Wind time: {wind_time:.2f}s")
-    print(f"{'='*50}")
-    
-    # Step 1: Servo holds
-    move_servo(SERVO_HOLD_POSITION)
-    time.sleep(0.5)
-    
-    # Step 2: Wind the motor at full speed
-    print("Winding...")
-    wind_motor(speed=100)
-    time.sleep(wind_time)
-    stop_motor()
-    time.sleep(0.3)
-    
-    # Step 3: LAUNCH!
-    print("🚀 LAUNCH!")
-    move_servo(SERVO_RELEASE_POSITION)
-    time.sleep(0.5)
-    
-    # Step 4: Reset
-    move_servo(SERVO_HOLD_POSITION)
-    time.sleep(0.5)
-    
-    print("Launch complete! Ready for next launch.\n")
+    global ADAPTIVE
+    cmd = user_input.strip().lower()
+    if cmd == 'q':
+        return False
+    if cmd == 'x':
+        launcher.cancel()
+        return True
+    if cmd == '?':
+        launcher.report()
+        print(f"{len(unmeasured)} shot(s) waiting for a measurement")
+        return True
+    if cmd == 'a':
+        ADAPTIVE = not ADAPTIVE
+        print("Adaptive calibration", "on" if ADAPTIVE else "off")
+        return True
+    if cmd == 'l':
+        if capture is None:
+            print("No accelerometer")
+        else:
+            launcher.capture = None if launcher.capture else capture
+            print("Launch capture", "on" if launcher.capture else "off")
+        return True
+    if cmd.startswith('m'):
+        # measured distance of the oldest unmeasured shot
+        try:
+            measured = float(cmd[1:])
+        except ValueError:
+            print("Enter the measured distance as e.g. 'm 48'")
+            return True
+        record_measurement(measured)
+        return True
+    try:
+        # Check if input ends with 'c' or 's' for manual mode
+        if cmd[-1:] in ('c', 's'):
+            # Manual mode: counts, or seconds at the nominal winch speed
+            value = float(cmd[:-1])
+            if cmd.endswith('s'):
+                value *= COUNTS_PER_S
+            counts = int(value)
+            
+            if counts > MAX_COUNTS:
+                print(f"Warning: {counts} counts exceeds maximum {MAX_COUNTS}")
+                print(f"Using maximum: {MAX_COUNTS}")
+                counts = MAX_COUNTS
+            elif counts < 0:
+                print("Error: Wind must be positive")
+                return True
+            
+            print(f"Queued {counts} counts (expect about {WIND_MAP.inverse(counts):.0f} inches)")
+            launcher.add_counts(counts)
+        else:
+            # Distance mode
+            target_distance = float(cmd)
+            if launcher.add(target_distance):
+                print(f"Queued {target_distance} inches")
+    except ValueError:
+        print("Invalid input! Enter a number (e.g., 45), counts with 'c' (e.g., 1500c) or time with 's' (e.g., 2.5s)")
+    return True
 
-# Initialize
-move_servo(SERVO_HOLD_POSITION)
+# Initialize: the launcher puts the servo in the hold position
+launcher = Launcher(winch, move_servo, WIND_MAP, SERVO_HOLD_POSITION, SERVO_RELEASE_POSITION)
+launcher.on_release = shot_released
+if CAPTURE:
+    launcher.capture = capture
+mqtt = connect_mqtt() if USE_MQTT else None
 time.sleep(0.5)
 
 print("\n" + "="*60)
 print("CATAPULT LAUNCH SYSTEM")
 print("="*60)
 print("Enter target distance in inches (e.g., '45')")
+print("OR enter encoder counts with 'c' (e.g., '1500c')")
 print("OR enter wind time in seconds with 's' (e.g., '2.5s')")
-print("Press Enter to launch immediately")
+print("Targets queue up and fire in turn; the next one winds as soon")
+print("as the arm resets. 'x' cancels, '?' shows status, 'q' quits.")
+print("After a shot, enter how far it went (e.g., 'm 48') to correct")
+print("the calibration; 'a' turns the correction off and on.")
+print("'l' turns the 1000 Hz launch capture off and on.")
 print("="*60 + "\n")
 
-# Main loop
-while True:
-    try:
-        # Get input from user
-        user_input = input("Enter distance (inches) or time (e.g., 2.5s) or 'q' to quit: ")
-        
-        if user_input.lower() == 'q':
+# Main loop: a hardware Timer runs the launch sequence every CONTROL_MS;
+# the main thread only reads serial input, so it never blocks a launch.
+CONTROL_MS = 5
+sched = FixedRateScheduler(CONTROL_MS, launcher.step)
+serial_in = SerialLines()
+sched.start()
+try:
+    while True:
+        line = serial_in.read()
+        if line is not None and not parse_command(line):
             print("Exiting...")
             break
-        
-        # Check if input ends with 's' for manual time mode
-        if user_input.lower().endswith('s'):
-            # Manual time mode
-            wind_time = float(user_input[:-1])  # Remove 's' and convert to float
-            
-            if wind_time > 4.2:
-                print(f"Warning: Wind time {wind_time}s exceeds maximum 4.2s")
-                print("Using maximum: 4.2s")
-                wind_time = 4.2
-            elif wind_time < 0:
-                print("Error: Wind time must be positive")
-                continue
-            
-            launch_at_time(wind_time)
-        else:
-            # Distance mode
-            target_distance = float(user_input)
-            launch_at_distance(target_distance)
-    
-    except ValueError:
-        print("Invalid input! Enter a number (e.g., 45) or time with 's' (e.g., 2.5s)")
-    except KeyboardInterrupt:
-        print("\nExiting...")
-        break
-
-stop_motor()
-move_servo(SERVO_HOLD_POSITION)
-print("Program stopped.")
\ No newline at end of file
+        if csv_pending:
+            csv_pending = False
+            try:
+                capture.write_csv(CAPTURE_CSV)
+            except OSError as e:
+                print(f"Could not write {CAPTURE_CSV}: {e}")
+        if mqtt:
+            try:
+                mqtt.check_msg()
+            except OSError as e:
+                print(f"MQTT check failed: {e}")
+        time.sleep_ms(20)
+except KeyboardInterrupt:
+    print("\nExiting...")
+finally:
+    sched.stop()
+    stop_motor()
+    move_servo(SERVO_HOLD_POSITION)
+    sched.report()
+    launcher.report()
+print("Program stopped.")
@@ -0,0 +1,75 @@
+class AdaptiveThreshold:
+    """
+    Tracks the black and white white-channel levels while driving, so the
+    decision threshold follows ambient light instead of a value fixed at boot.
+
+    Each level is an exponential moving average kept in fixed point (8
+    fractional bits) and updated with a shift, so one update is a handful of
+    integer adds and shifts. Only confident samples move a level: a sample
+    must lie within the outer quarter of the black-white gap on its side,
+    which keeps the grey readings of an edge follower from pulling the two
+    levels together.
+    """
+
+    FP = 8  # fractional bits
+
+    def __init__(self, black, white, shift=4, hyst_shift=3, min_gap=40):
+        """
+        Args:
+            black, white (int): starting levels (e.g. from calibration).
+            shift (int): EMA weight is 1 / 2**shift per sample.
+            hyst_shift (int): hysteresis half-width is gap >> hyst_shift.
+            min_gap (int): levels are never allowed closer than this.
+        """
+        self._black = int(black) << self.FP
+        self._white = int(white) << self.FP
+        self.shift = shift
+        self.hyst_shift = hyst_shift
+        self.min_gap = min_gap
+        self.on_black = True
+
+    @property
+    def black(self):
+        return self._black >> self.FP
+
+    @property
+    def white(self):
+        return self._white >> self.FP
+
+    def levels(self):
+        return self._black >> self.FP, self._white >> self.FP
+
+    def threshold(self):
+        return (self._black + self._white) >> (self.FP + 1)
+
+    def learn(self, w, is_black):
+        """Update the level of an already classified sample."""
+        black = self._black >> self.FP
+        white = self._white >> self.FP
+        band = (white - black) >> 2
+        if is_black:
+            if w > black + band:
+                return
+            nb = self._black + (((w << self.FP) - self._black) >> self.shift)
+            if (self._white - nb) >> self.FP >= self.min_gap:
+                self._black = nb
+        else:
+            if w < white - band:
+                return
+            nw = self._white + (((w << self.FP) - self._white) >> self.shift)
+            if (nw - self._black) >> self.FP >= self.min_gap:
+                self._white = nw
+
+    def update(self, w):
+        """Classify w with hysteresis, learn from it, and return True on black."""
+        black = self._black >> self.FP
+        white = self._white >> self.FP
+        mid = (black + white) >> 1
+        h = (white - black) >> self.hyst_shift
+        if self.on_black:
+            if w > mid + h:
+                self.on_black = False
+        elif w < mid - h:
+            self.on_black = True
+        self.learn(w, self.on_black)
+        return self.on_black
@@ -0,0 +1,105 @@
+from array import array
+
+
+class Odometer:
+    """Distance and heading from the two wheel encoders, in encoder counts.
+
+    Distance only grows with forward/backward travel (turning in place moves
+    the wheels in opposite directions and adds nothing); heading is the
+    right-minus-left count difference."""
+
+    def __init__(self, left_enc, right_enc):
+        self.left_enc = left_enc
+        self.right_enc = right_enc
+        self.last_l = left_enc.value()
+        self.last_r = right_enc.value()
+        self.dist = 0
+        self.heading = 0
+
+    def update(self):
+        l = self.left_enc.value()
+        r = self.right_enc.value()
+        dl = l - self.last_l
+        dr = r - self.last_r
+        self.last_l = l
+        self.last_r = r
+        self.dist += abs(dl + dr) // 2
+        self.heading += dr - dl
+        return self.dist
+
+
+class TrackMap:
+    """
+    Lap map in fixed-distance bins of bin_counts encoder counts.
+
+    During the learning lap record() stores, per bin, how much the heading
+    changed (curvature) and whether the line was lost there. plan() turns
+    that into a per-bin speed: v_max on straights, down to v_min in the
+    sharpest curves and wherever the line was lost, taking the minimum over
+    the next `lookahead` bins so the car slows before a curve, not in it.
+    All tables are preallocated arrays.
+    """
+
+    def __init__(self, bin_counts=200, max_bins=256, v_min=35, v_max=90,
+                 curve_full=120, lookahead=3):
+        self.bin_counts = bin_counts
+        self.max_bins = max_bins
+        self.v_min = v_min
+        self.v_max = v_max
+        self.curve_full = curve_full    # heading change per bin treated as a full curve
+        self.lookahead = lookahead
+        self.turn = array("h", [0] * max_bins)
+        self.loss = array("B", [0] * max_bins)
+        self.speed = array("B", [0] * max_bins)
+        self.n = 0                      # bins in one lap, 0 until a lap is learned
+        self.lap_dist = 0
+        self.lap_heading = 0
+
+    def start_lap(self, dist, heading):
+        self.lap_dist = dist
+        self.lap_heading = heading
+
+    def _bin(self, dist):
+        return (dist - self.lap_dist) // self.bin_counts
+
+    def record(self, dist, heading, lost=False):
+        """Learning lap: accumulate the heading change into the current bin."""
+        i = self._bin(dist)
+        if i >= self.max_bins:
+            return
+        d = heading - self.lap_heading
+        self.lap_heading = heading
+        t = self.turn[i] + d
+        self.turn[i] = 32767 if t > 32767 else -32768 if t < -32768 else t
+        if lost and self.loss[i] < 255:
+            self.loss[i] += 1
+
+    def finish_lap(self, dist):
+        """End of the learning lap: fix the lap length and plan speeds."""
+        self.n = max(1, min(self.max_bins, self._bin(dist) + 1))
+        self.plan()
+
+    def plan(self):
+        n = self.n
+        span = self.v_max - self.v_min
+        raw = array("B", [0] * n)
+        for i in range(n):
+            sev = abs(self.turn[i]) * 100 // self.curve_full
+            if self.loss[i]:
+                sev = 100
+            if sev > 100:
+                sev = 100
+            raw[i] = self.v_max - span * sev // 100
+        for i in range(n):
+            v = raw[i]
+            for k in range(1, self.lookahead + 1):
+                u = raw[(i + k) % n]
+                if u < v:
+                    v = u
+            self.speed[i] = v
+
+    def speed_at(self, dist, default):
+        """Planned speed for the current position, or default before a lap is learned."""
+        if not self.n:
+            return default
+        return self.speed[self._bin(dist) % self.n]
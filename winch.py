@@ -0,0 +1,124 @@
+from machine import Pin, PWM
+import time
+
+# Winch states
+IDLE = 0
+WINDING = 1
+DONE = 2
+STALLED = 3
+STATE_NAMES = ("idle", "winding", "done", "stalled")
+
+
+class Count:
+    def __init__(self, A, B):
+        self.A = Pin(A, Pin.IN)
+        self.B = Pin(B, Pin.IN)
+        self.counter = 0
+        self.A.irq(self.cb, Pin.IRQ_RISING | Pin.IRQ_FALLING)
+        self.B.irq(self.cb, Pin.IRQ_RISING | Pin.IRQ_FALLING)
+
+    def cb(self, pin):
+        other, inc = (self.B, 1) if pin == self.A else (self.A, -1)
+        self.counter += -inc if pin.value() != other.value() else inc
+
+    def value(self):
+        return self.counter
+
+
+class Winch:
+    """
+    Catapult winch that winds to an encoder count instead of for a time.
+
+    start(counts) turns the motor on; poll() (call it every few ms) cuts
+    the motor when the count gets within `coast` of the target, so the
+    motor's run-on after the cut lands it on the target. finish(), called
+    once the motor has stopped, reads where it ended and adjusts `coast`
+    towards the overshoot actually seen.
+
+    If the count advances by less than stall_counts in stall_ms the motor
+    is stopped and the wind ends STALLED (string jammed, arm at its stop,
+    battery flat). Counts are relative to where each wind starts.
+    """
+
+    def __init__(self, m1=14, m2=27, enc_a=32, enc_b=39, reverse=False,
+                 freq=10000, coast=20, stall_ms=300, stall_counts=5):
+        self.M1 = PWM(Pin(m1), freq=freq, duty_u16=0)
+        self.M2 = PWM(Pin(m2), freq=freq, duty_u16=0)
+        self.enc = Count(enc_a, enc_b)
+        self.sign = -1 if reverse else 1
+        self.coast = coast
+        self.stall_ms = stall_ms
+        self.stall_counts = stall_counts
+        self.state = IDLE
+        self.target = 0
+        self.base = 0
+        self.cut_at = 0
+        self.progress = 0       # count at the last stall check
+        self.t_progress = 0
+        self.stop()
+
+    def count(self):
+        """Counts wound since the last start()."""
+        return self.sign * self.enc.counter - self.base
+
+    def stop(self):
+        self.M1.duty_u16(0)
+        self.M2.duty_u16(0)
+
+    def run(self, speed=100):
+        duty = int(speed * 65535 / 100)
+        self.M1.duty_u16(0)
+        self.M2.duty_u16(duty)
+
+    def start(self, counts, speed=100):
+        self.base = self.sign * self.enc.counter
+        self.target = int(counts)
+        self.progress = 0
+        self.t_progress = time.ticks_ms()
+        self.state = WINDING
+        if self.target - self.coast <= 0:
+            self._cut(0)
+        else:
+            self.run(speed)
+
+    def _cut(self, c):
+        self.stop()
+        self.cut_at = c
+        self.state = DONE
+
+    def poll(self):
+        """Closed-loop check while winding. Returns the state."""
+        if self.state != WINDING:
+            return self.state
+        c = self.count()
+        if c >= self.target - self.coast:
+            self._cut(c)
+            return DONE
+        now = time.ticks_ms()
+        if c - self.progress >= self.stall_counts:
+            self.progress = c
+            self.t_progress = now
+        elif time.ticks_diff(now, self.t_progress) > self.stall_ms:
+            self.stop()
+            self.cut_at = c
+            self.state = STALLED
+        return self.state
+
+    def finish(self):
+        """Final count once the motor has stopped; learns the coast from a clean stop."""
+        c = self.count()
+        if self.state == DONE and self.cut_at:
+            over = c - self.cut_at
+            if over >= 0:
+                self.coast = (3 * self.coast + over + 2) // 4
+        self.state = IDLE
+        return c
+
+    def wind_to(self, counts, speed=100, settle_ms=300):
+        """Blocking wind: returns (final count, DONE or STALLED)."""
+        self.start(counts, speed)
+        while self.poll() == WINDING:
+            time.sleep_ms(2)
+        state = self.state
+        time.sleep_ms(settle_ms)
+        return self.finish(), state